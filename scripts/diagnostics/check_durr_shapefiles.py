@@ -8,11 +8,12 @@ print(f'\nColumns: {coastline.columns.tolist()}')
 print(f'\nSample data:')
 print(coastline.head())
 print(f'\nEstuary types (FIN_TYP):')
-print(coastline['FIN_TYP'].value_counts())
+type_counts = coastline['FIN_TYP'].value_counts()
+print(type_counts)
 print(f'\nType mapping:')
 type_map = {1: 'Delta', 2: 'Lagoon', 3: 'Fjord', 4: 'Coastal Plain', 5: 'Karst', 6: 'Tidal system', 7: 'Archipelagic', 8: 'Small deltas'}
 for code, name in type_map.items():
-    count = len(coastline[coastline['FIN_TYP'] == code])
+    count = type_counts.get(code, 0)
     print(f'  {code} = {name}: {count:,}')
 
 # Check catchment shapefile
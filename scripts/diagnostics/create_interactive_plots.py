@@ -27,9 +27,11 @@ import geopandas as gpd
 import pandas as pd
 import xarray as xr
 import numpy as np
+import shapely
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import json
 
 # ==============================================================================
@@ -41,6 +43,32 @@ OUTPUT_DIR = BASE_DIR / 'diagnostics_html'
 OUTPUT_DIR.mkdir(exist_ok=True)
 
 MAX_POINTS_PLOT = 10000  # Maximum points per plot (for performance)
+MAX_HOVER_STATIONS = 5000  # GlobSalt stations drawn as hoverable markers
+
+# Numeric columns written to HTML as float32 (half the JSON text of float64)
+FLOAT32_COLUMNS = ['lon', 'lat', 'salinity_mean_psu', 'salinity_psu',
+                   'discharge', 'tds', 'temperature']
+
+# ==============================================================================
+# HELPERS
+# ==============================================================================
+
+def downcast_plot_columns(df):
+    """Cast plotted numeric columns to float32 before plotly serialization"""
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('float32')
+    return df
+
+def build_hover_text(df, cols):
+    """Pre-format hover columns into one '<br>'-joined string column"""
+    if not cols:
+        return pd.Series('', index=df.index)
+    parts = []
+    for col in cols:
+        values = df[col].round(2) if pd.api.types.is_float_dtype(df[col]) else df[col]
+        parts.append(col + ': ' + values.astype(str))
+    return parts[0].str.cat(parts[1:], sep='<br>')
 
 # ==============================================================================
 # PLOTTING FUNCTIONS
@@ -64,10 +92,18 @@ def plot_globsalt_stations():
     # Extract coordinates
     gdf['lon'] = gdf.geometry.x
     gdf['lat'] = gdf.geometry.y
+    gdf = downcast_plot_columns(gdf)
+    
+    # Hover markers only for the best-sampled stations; the density layer
+    # below carries ALL stations without an SVG marker per point
+    if 'n_measurements' in gdf.columns:
+        hover_stations = gdf.nlargest(MAX_HOVER_STATIONS, 'n_measurements')
+    else:
+        hover_stations = gdf.head(MAX_HOVER_STATIONS)
     
     # Create clear hover text with meaningful names
     hover_text = []
-    for idx, row in gdf.iterrows():
+    for idx, row in hover_stations.iterrows():
         text = f"<b>Station ID:</b> {row.get('Station_ID', 'N/A')}<br>"
         text += f"<b>Mean Salinity:</b> {row.get('salinity_mean_psu', 0):.2f} PSU<br>"
         text += f"<b>Water Type:</b> {row.get('Water_type', 'N/A')}<br>"
@@ -76,27 +112,40 @@ def plot_globsalt_stations():
         text += f"<b>Country:</b> {row.get('Country', 'N/A')}"
         hover_text.append(text)
     
-    # Create plot - Color by MEAN SALINITY only!
-    fig = go.Figure(go.Scattermapbox(
+    # Create plot - the density layer sums salinity over overlapping stations,
+    # so its values are not PSU; it gets no colorbar and the PSU scale is
+    # carried by the hover markers below
+    fig = go.Figure(go.Densitymapbox(
         lon=gdf['lon'],
         lat=gdf['lat'],
+        z=gdf['salinity_mean_psu'],
+        radius=5,
+        colorscale='Viridis',
+        showscale=False,
+        hoverinfo='skip',
+        name='GlobSalt Stations (all, salinity-weighted density)'
+    ))
+    
+    fig.add_trace(go.Scattermapbox(
+        lon=hover_stations['lon'],
+        lat=hover_stations['lat'],
         mode='markers',
         marker=dict(
             size=5,
-            color=gdf['salinity_mean_psu'],
+            color=hover_stations['salinity_mean_psu'],
             colorscale='Viridis',
             showscale=True,
+            cmin=0,
+            cmax=35,
             colorbar=dict(
                 title='Mean Salinity<br>(PSU)',
                 x=1.02
             ),
-            cmin=0,
-            cmax=35,
             opacity=0.7
         ),
         text=hover_text,
         hoverinfo='text',
-        name='GlobSalt Stations'
+        name=f'Top {len(hover_stations):,} stations (by measurements)'
     ))
     
     fig.update_layout(
@@ -113,7 +162,8 @@ def plot_globsalt_stations():
     )
     
     output_file = OUTPUT_DIR / 'globsalt_stations.html'
-    fig.write_html(output_file, config={'scrollZoom': True})
+    fig.write_html(output_file, config={'scrollZoom': True},
+                   include_plotlyjs='cdn', validate=False)
     
     file_size = output_file.stat().st_size / (1024**2)
     print(f"   ✅ Saved: {output_file}")
@@ -133,18 +183,20 @@ def plot_dynqual_rivers():
         print(f"   ⚠️  File not found: {discharge_file}")
         return
     
-    # Load and process
-    ds_dis = xr.open_dataset(discharge_file)
-    ds_tds = xr.open_dataset(tds_file)
-    ds_temp = xr.open_dataset(temp_file)
-    
-    # Average over time
-    discharge = ds_dis['dis'].mean(dim='time').values
-    tds = ds_tds['tds'].mean(dim='time').values
-    temp = ds_temp['triver'].mean(dim='time').values - 273.15  # Kelvin to Celsius
-    
-    # Create coordinate grids
-    lons, lats = np.meshgrid(ds_dis.lon.values, ds_dis.lat.values)
+    # Load and process (files closed on exit, even if averaging fails)
+    with xr.open_dataset(discharge_file) as ds_dis, \
+         xr.open_dataset(tds_file) as ds_tds, \
+         xr.open_dataset(temp_file) as ds_temp:
+        # All three share the DynQual grid - merge and average over time in one pass
+        ds = xr.merge([ds_dis['dis'], ds_tds['tds'], ds_temp['triver']], join='override')
+        means = ds.mean(dim='time').load()
+        
+        discharge = means['dis'].values
+        tds = means['tds'].values
+        temp = means['triver'].values - 273.15  # Kelvin to Celsius
+        
+        # Create coordinate grids
+        lons, lats = np.meshgrid(ds_dis.lon.values, ds_dis.lat.values)
     
     # Flatten and filter
     df = pd.DataFrame({
@@ -180,6 +232,8 @@ def plot_dynqual_rivers():
         df = df[(df['discharge'] >= p1) & (df['discharge'] <= p99)]
         print(f"   Discharge filtered to: {p1:.1f} - {p99:.1f} m³/s (1st-99th percentile)")
     
+    df = downcast_plot_columns(df)
+    
     # Create interactive plot with dropdown selector
     fig = go.Figure()
     
@@ -253,12 +307,9 @@ def plot_dynqual_rivers():
     )
     
     output_file = OUTPUT_DIR / 'dynqual_rivers.html'
-    fig.write_html(output_file, config={'scrollZoom': True})
+    fig.write_html(output_file, config={'scrollZoom': True},
+                   include_plotlyjs='cdn', validate=False)
     print(f"   ✅ Saved: {output_file}")
-    
-    ds_dis.close()
-    ds_tds.close()
-    ds_temp.close()
 
 def plot_gcc_coastal():
     """Create interactive plot for GCC coastal characteristics"""
@@ -284,6 +335,11 @@ def plot_gcc_coastal():
     if 'lon' in numeric_cols and 'lat' in numeric_cols:
         numeric_cols.remove('lon')
         numeric_cols.remove('lat')
+    df = downcast_plot_columns(df)
+    
+    # Hover text for the first 10 columns, formatted once in pandas
+    hover_cols = numeric_cols[:10]
+    df['_hover'] = build_hover_text(df, hover_cols)
     
     # Create plot
     fig = px.scatter_mapbox(
@@ -291,7 +347,8 @@ def plot_gcc_coastal():
         lat='lat',
         lon='lon',
         color=numeric_cols[0] if numeric_cols else None,
-        hover_data=numeric_cols[:10],  # First 10 columns
+        hover_name='_hover',
+        hover_data={col: False for col in hover_cols},
         color_continuous_scale='Viridis',
         title='GCC - Global Coastal Characteristics (100km segments)',
         zoom=1
@@ -304,7 +361,8 @@ def plot_gcc_coastal():
     )
     
     output_file = OUTPUT_DIR / 'gcc_coastal.html'
-    fig.write_html(output_file, config={'scrollZoom': True})
+    fig.write_html(output_file, config={'scrollZoom': True},
+                   include_plotlyjs='cdn', validate=False)
     print(f"   ✅ Saved: {output_file}")
 
 def plot_coastal_basins():
@@ -324,17 +382,23 @@ def plot_coastal_basins():
         gdf = gdf.sample(n=MAX_POINTS_PLOT, random_state=42)
         print(f"   Sampled to {len(gdf):,} basins")
     
-    # Get centroids for point plot
-    gdf['lon'] = gdf.geometry.centroid.x
-    gdf['lat'] = gdf.geometry.centroid.y
+    # Get centroids for point plot (one pass), then drop polygons so plotly
+    # never serializes them
+    centroids = shapely.centroid(gdf.geometry.values)
+    gdf['lon'] = shapely.get_x(centroids)
+    gdf['lat'] = shapely.get_y(centroids)
+    df = downcast_plot_columns(pd.DataFrame(gdf.drop(columns='geometry')))
+    hover_cols = ['estuary_name', 'estuary_type', 'HYBAS_ID', 'SUB_AREA']
+    df['_hover'] = build_hover_text(df, hover_cols)
     
     # Create plot
     fig = px.scatter_mapbox(
-        gdf,
+        df,
         lat='lat',
         lon='lon',
         color='estuary_type',
-        hover_data=['estuary_name', 'estuary_type', 'HYBAS_ID', 'SUB_AREA'],
+        hover_name='_hover',
+        hover_data={col: False for col in hover_cols},
         title='Coastal Basins with Estuarine Types',
         zoom=1,
         color_discrete_map={
@@ -354,7 +418,8 @@ def plot_coastal_basins():
     )
     
     output_file = OUTPUT_DIR / 'coastal_basins.html'
-    fig.write_html(output_file, config={'scrollZoom': True})
+    fig.write_html(output_file, config={'scrollZoom': True},
+                   include_plotlyjs='cdn', validate=False)
     print(f"   ✅ Saved: {output_file}")
 
 def plot_baum_morphometry():
@@ -369,16 +434,21 @@ def plot_baum_morphometry():
     gdf = gpd.read_file(file_path)
     print(f"   Loaded {len(gdf):,} estuaries")
     
+    # lat/lon are already attributes - plot from attributes only
+    df = downcast_plot_columns(pd.DataFrame(gdf.drop(columns='geometry')))
+    
     # Create plot
     hover_cols = [col for col in ['name', 'geomorphotype', 'tectonic_setting', 'size_category'] 
-                  if col in gdf.columns]
+                  if col in df.columns]
+    df['_hover'] = build_hover_text(df, hover_cols)
     
     fig = px.scatter_mapbox(
-        gdf,
+        df,
         lat='lat',
         lon='lon',
         color='geomorphotype',
-        hover_data=hover_cols,
+        hover_name='_hover',
+        hover_data={col: False for col in hover_cols},
         title='Baum et al. (2024) - Large Estuary Morphometry',
         zoom=1,
         color_discrete_map={
@@ -397,7 +467,8 @@ def plot_baum_morphometry():
     )
     
     output_file = OUTPUT_DIR / 'baum_morphometry.html'
-    fig.write_html(output_file, config={'scrollZoom': True})
+    fig.write_html(output_file, config={'scrollZoom': True},
+                   include_plotlyjs='cdn', validate=False)
     print(f"   ✅ Saved: {output_file}")
 
 # ==============================================================================
@@ -412,12 +483,18 @@ def main():
     print(f"\nOutput directory: {OUTPUT_DIR}")
     print(f"Max points per plot: {MAX_POINTS_PLOT:,}")
     
-    # Generate plots
-    plot_globsalt_stations()
-    plot_dynqual_rivers()
-    plot_gcc_coastal()
-    plot_coastal_basins()
-    plot_baum_morphometry()
+    # Generate plots - independent inputs/outputs, so build them in parallel
+    plot_functions = [
+        plot_globsalt_stations,
+        plot_dynqual_rivers,
+        plot_gcc_coastal,
+        plot_coastal_basins,
+        plot_baum_morphometry
+    ]
+    with ProcessPoolExecutor(max_workers=len(plot_functions)) as executor:
+        futures = [executor.submit(fn) for fn in plot_functions]
+        for future in futures:
+            future.result()  # Re-raise any worker error
     
     print("\n" + "="*80)
     print("✅ ALL PLOTS GENERATED!")
@@ -26,10 +26,13 @@ Version: 5.0 (BOTTOM-UP FROM RIVERS)
 """
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
 from pathlib import Path
 import folium
 from folium import plugins
+import json
 import time
 import warnings
 warnings.filterwarnings('ignore')
@@ -53,7 +56,7 @@ DURR_COASTLINE_FILE = BASE_DIR / 'data' / 'raw' / 'Worldwide-typology-Shapefile-
 
 # Output files
 TIDAL_BASINS_FULL = PROCESSED_DIR / 'tidal_basins_river_based_lev07.gpkg'
-TIDAL_BASINS_WEB = PROCESSED_DIR / 'tidal_basins_river_based_lev07_web.geojson'
+TIDAL_BASINS_WEB = PROCESSED_DIR / 'tidal_basins_river_based_lev07_web.parquet'  # GeoParquet
 OUTPUT_MAP_NO_RIVERS = OUTPUT_DIR / 'tidal_basins_web.html'  # For web hosting
 OUTPUT_MAP_WITH_RIVERS = OUTPUT_DIR / 'tidal_basins_with_rivers.html'  # Full version
 
@@ -61,6 +64,7 @@ OUTPUT_MAP_WITH_RIVERS = OUTPUT_DIR / 'tidal_basins_with_rivers.html'  # Full ve
 MAX_DISTANCE_KM = 300  # Maximum distance from coast
 MIN_ORDER = 1          # Minimum stream order
 SIMPLIFY_WEB = 0.02    # Simplification for web (2.2 km)
+EQUAL_AREA_CRS = 'ESRI:54009'  # World Mollweide, for true km² areas
 
 # ==============================================================================
 # STEP 1: FIND ALL COASTAL BASINS (NO DÜRR FILTER!)
@@ -112,12 +116,15 @@ def find_coastal_rivers(coastal_basins, grit_file, all_basins):
     
     # CRITICAL: Find rivers in ALL coastal basins (not just DIST_SINK=0!)
     print(f"\n   Finding rivers in ALL coastal basins (within {MAX_DISTANCE_KM} km)...")
-    grit_points = grit.copy()
-    grit_points['geometry'] = grit_points.geometry.centroid
+    grit_points = gpd.GeoDataFrame(
+        grit[['global_id', 'catchment_id', 'strahler_order', 'is_mainstem', 'domain']],
+        geometry=shapely.centroid(grit.geometry.values),
+        crs=grit.crs
+    )
     
     # Spatial join with ALL coastal basins
     grit_in_coastal = gpd.sjoin(
-        grit_points[['global_id', 'catchment_id', 'strahler_order', 'is_mainstem', 'domain', 'geometry']],
+        grit_points,
         coastal_basins[['HYBAS_ID', 'DIST_SINK', 'geometry']],
         how='inner',
         predicate='within'
@@ -198,19 +205,25 @@ def classify_with_durr(tidal_basins, durr_catchment_file, durr_coastline_file):
         -9999: 'Unclassified'           # Missing data
     }
     
-    # Apply to coastline
-    durr_coastline['estuary_type'] = durr_coastline['FIN_TYP'].map(type_map)
+    # Apply to coastline (rename the few FIN_TYP categories, not every row)
+    durr_coastline['estuary_type'] = pd.Categorical(
+        durr_coastline['FIN_TYP'], categories=list(type_map)
+    ).rename_categories(type_map)
     durr_coastline = durr_coastline[
         (durr_coastline['estuary_type'] != 'Unclassified') & 
         (durr_coastline['estuary_type'] != 'Endorheic or Glaciated')
     ].copy()
+    durr_coastline['estuary_type'] = durr_coastline['estuary_type'].cat.remove_unused_categories()
     
     # Apply to catchments
-    durr_catchments['estuary_type'] = durr_catchments['FIN_TYP'].map(type_map)
+    durr_catchments['estuary_type'] = pd.Categorical(
+        durr_catchments['FIN_TYP'], categories=list(type_map)
+    ).rename_categories(type_map)
     durr_catchments = durr_catchments[
         (durr_catchments['estuary_type'] != 'Unclassified') &
         (durr_catchments['estuary_type'] != 'Endorheic or Glaciated')
     ].copy()
+    durr_catchments['estuary_type'] = durr_catchments['estuary_type'].cat.remove_unused_categories()
     print(f"   Valid catchments (after filter): {len(durr_catchments):,}")
     print(f"   Valid coastline (after filter): {len(durr_coastline):,}")
     
@@ -233,18 +246,19 @@ def classify_with_durr(tidal_basins, durr_catchment_file, durr_coastline_file):
         how='left',
         predicate='intersects'
     )
-    tidal_with_catchments = tidal_with_catchments.drop_duplicates(subset='HYBAS_ID', keep='first')
+    # Dedupe on the key column only (sjoin repeats index labels, so use a mask)
+    tidal_with_catchments = tidal_with_catchments[~tidal_with_catchments['HYBAS_ID'].duplicated(keep='first')]
     if 'index_right' in tidal_with_catchments.columns:
         tidal_with_catchments = tidal_with_catchments.drop(columns=['index_right'])
     
     # METHOD 2: Classify via COASTLINE (nearest for ocean basins)
     print(f"\n   Method 2: Finding nearest coastline for ocean basins...")
-    ocean_basins = tidal_with_catchments[tidal_with_catchments['DIST_SINK'] == 0].copy()
+    ocean_basins = tidal_with_catchments[tidal_with_catchments['DIST_SINK'] == 0]
     
-    # Create a separate GeoDataFrame with centroids
+    # Centroids straight from the geometry array (no attribute copy of ocean_basins)
     ocean_centroids = gpd.GeoDataFrame(
-        ocean_basins[['HYBAS_ID']],
-        geometry=ocean_basins.geometry.centroid,
+        {'HYBAS_ID': ocean_basins['HYBAS_ID'].values},
+        geometry=shapely.centroid(ocean_basins.geometry.values),
         crs=ocean_basins.crs
     )
     
@@ -258,7 +272,7 @@ def classify_with_durr(tidal_basins, durr_catchment_file, durr_coastline_file):
         how='left',
         max_distance=0.5  # 0.5 degrees ~ 55km
     )
-    ocean_with_coastline = ocean_with_coastline.drop_duplicates(subset='HYBAS_ID', keep='first')
+    ocean_with_coastline = ocean_with_coastline[~ocean_with_coastline['HYBAS_ID'].duplicated(keep='first')]
     if 'index_right' in ocean_with_coastline.columns:
         ocean_with_coastline = ocean_with_coastline.drop(columns=['index_right'])
     
@@ -305,41 +319,49 @@ def classify_with_durr(tidal_basins, durr_catchment_file, durr_coastline_file):
     
     return tidal_clean, durr_coastline
 
+# ==============================================================================
+# HELPER: EQUAL-AREA AREAS
+# ==============================================================================
+
+def area_km2(geometries):
+    """True areas (km²) of a GeoSeries via one batched equal-area projection"""
+    return shapely.area(geometries.to_crs(EQUAL_AREA_CRS).values) / 1e6
+
 # ==============================================================================
 # HELPER: CLEAN SMALL ISLANDS FROM MULTIPOLYGONS
 # ==============================================================================
 
-def clean_small_islands(geometry, min_area_km2=5):
-    """Remove small island polygons from MultiPolygon geometries"""
-    from shapely.geometry import MultiPolygon, Polygon
-    
-    if geometry is None or geometry.is_empty:
-        return geometry
-    
-    if geometry.geom_type == 'Polygon':
-        # Single polygon - keep as is if large enough
-        area_km2 = geometry.area * 111 * 111  # rough degrees to km2
-        return geometry if area_km2 >= min_area_km2 else None
-    
-    elif geometry.geom_type == 'MultiPolygon':
-        # Keep only large polygons from MultiPolygon
-        large_polygons = []
-        total_small_area = 0
-        for poly in geometry.geoms:
-            area_km2 = poly.area * 111 * 111  # rough degrees to km2
-            if area_km2 >= min_area_km2:
-                large_polygons.append(poly)
-            else:
-                total_small_area += area_km2
-        
-        if len(large_polygons) == 0:
-            return None
-        elif len(large_polygons) == 1:
-            return large_polygons[0]
-        else:
-            return MultiPolygon(large_polygons)
-    
-    return geometry
+def clean_small_islands(geometries, min_area_km2=5):
+    """Remove small island polygons from MultiPolygon geometries (vectorized)
+
+    Works on the whole GeoSeries at once: explode to parts, drop parts under
+    min_area_km2 (measured in EQUAL_AREA_CRS), then reassemble per basin in
+    the original CRS. Basins with a single remaining part come back as
+    Polygon, basins with no parts left come back as None.
+    """
+    geoms = np.asarray(geometries.values)
+    
+    # Explode every (Multi)Polygon into its parts, remembering the owner row
+    parts, owner = shapely.get_parts(geoms, return_index=True)
+    
+    # True areas: project all parts to equal-area in one batched transform
+    areas_km2 = area_km2(gpd.GeoSeries(parts, crs=geometries.crs))
+    keep = areas_km2 >= min_area_km2
+    kept_parts = parts[keep]
+    kept_owner = owner[keep]
+    n_kept = np.bincount(kept_owner, minlength=len(geoms))
+    
+    # Reassemble kept parts per basin (rows without kept parts stay None)
+    cleaned = np.full(len(geoms), None, dtype=object)
+    shapely.multipolygons(kept_parts, indices=kept_owner, out=cleaned)
+    single = n_kept == 1
+    cleaned[single] = shapely.get_geometry(cleaned[single], 0)
+    
+    # Non-polygonal geometries are passed through untouched
+    is_polygonal = np.isin(shapely.get_type_id(geoms), [3, 6])
+    cleaned[~is_polygonal] = geoms[~is_polygonal]
+    
+    return gpd.GeoSeries(cleaned, index=geometries.index, crs=geometries.crs)
 
 # ==============================================================================
 # STEP 5: CREATE OUTPUT FILES
@@ -356,26 +378,24 @@ def create_output_files(tidal_basins):
     print(f"     Before: {len(tidal_basins):,} basins")
     
     # Count MultiPolygons before
-    multi_before = len(tidal_basins[tidal_basins.geometry.geom_type == 'MultiPolygon'])
+    multi_before = int((shapely.get_type_id(tidal_basins.geometry.values) == 6).sum())
     print(f"     MultiPolygons before: {multi_before:,}")
     
-    # Clean geometries
+    # Clean geometries (the only copy - keeps the caller's frame untouched)
     tidal_basins = tidal_basins.copy()
-    tidal_basins['geometry'] = tidal_basins['geometry'].apply(
-        lambda g: clean_small_islands(g, min_area_km2=5)
-    )
+    tidal_basins['geometry'] = clean_small_islands(tidal_basins.geometry, min_area_km2=5)
     
-    # Remove basins with no geometry left
-    tidal_basins = tidal_basins[tidal_basins['geometry'].notna()].copy()
-    tidal_basins = tidal_basins[~tidal_basins.geometry.is_empty].copy()
+    # Remove basins with no geometry left (missing or empty, one mask)
+    geoms = tidal_basins.geometry.values
+    tidal_basins = tidal_basins[~(shapely.is_missing(geoms) | shapely.is_empty(geoms))]
     
     # Count MultiPolygons after
-    multi_after = len(tidal_basins[tidal_basins.geometry.geom_type == 'MultiPolygon'])
+    multi_after = int((shapely.get_type_id(tidal_basins.geometry.values) == 6).sum())
     print(f"     MultiPolygons after: {multi_after:,}")
     print(f"     Cleaned: {multi_before - multi_after:,} converted to Polygon")
     
     # Also remove tiny basins
-    tidal_filtered = tidal_basins[tidal_basins['SUB_AREA'] >= 5].copy()
+    tidal_filtered = tidal_basins[tidal_basins['SUB_AREA'] >= 5]
     removed = len(tidal_basins) - len(tidal_filtered)
     
     print(f"     After all filtering: {len(tidal_filtered):,} basins")
@@ -388,7 +408,7 @@ def create_output_files(tidal_basins):
         'is_seed', 'geometry'
     ]
     output_cols = [col for col in output_cols if col in tidal_filtered.columns]
-    tidal_clean = tidal_filtered[output_cols].copy()
+    tidal_clean = tidal_filtered[output_cols]
     
     # Rename for clarity
     tidal_clean = tidal_clean.rename(columns={
@@ -399,9 +419,12 @@ def create_output_files(tidal_basins):
         'COAST': 'coastal_flag'
     })
     
+    # Hilbert-sort rows so nearby basins share pages/row groups on disk
+    tidal_clean = tidal_clean.iloc[np.argsort(tidal_clean.geometry.hilbert_distance().values)]
+    
     # Save full resolution
     print(f"\n💾 Saving full resolution...")
-    tidal_clean.to_file(TIDAL_BASINS_FULL, driver='GPKG')
+    tidal_clean.to_file(TIDAL_BASINS_FULL, driver='GPKG', engine='pyogrio')
     size_mb = TIDAL_BASINS_FULL.stat().st_size / (1024*1024)
     print(f"✅ Full: {size_mb:.1f} MB")
     
@@ -409,12 +432,106 @@ def create_output_files(tidal_basins):
     print(f"\n💾 Creating web version (minimal)...")
     tidal_web = tidal_clean[['estuary_type', 'basin_area_km2', 'geometry']].copy()
     tidal_web['geometry'] = tidal_web.geometry.simplify(SIMPLIFY_WEB)
-    tidal_web.to_file(TIDAL_BASINS_WEB, driver='GeoJSON')
+    tidal_web.to_parquet(TIDAL_BASINS_WEB, compression='snappy')
     size_mb = TIDAL_BASINS_WEB.stat().st_size / (1024*1024)
     print(f"✅ Web: {size_mb:.1f} MB (minimal columns)")
     
     return tidal_clean
 
+# ==============================================================================
+# HELPER: FOLIUM LAYERS BY ESTUARY TYPE
+# ==============================================================================
+
+def geojson_layers_by_type(gdf, columns):
+    """GeoJSON FeatureCollection per estuary type, keeping only the given properties"""
+    layers = {}
+    for etype, group in gdf[columns + ['geometry']].groupby('estuary_type', observed=True):
+        # Geometries via GEOS GeoJSON writer, parsed in one json.loads call
+        geometry_json = shapely.to_geojson(group.geometry.values)
+        geometries = json.loads('[' + ','.join(g or 'null' for g in geometry_json) + ']')
+        
+        # NaN is not valid JSON - emit null like __geo_interface__ does
+        attrs = group[columns].astype(object)
+        properties = attrs.where(attrs.notna(), None).to_dict('records')
+        
+        layers[etype] = {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature', 'properties': props, 'geometry': geom}
+                for props, geom in zip(properties, geometries)
+            ]
+        }
+    return layers
+
+def add_type_layers(m, durr_catchment_layers, durr_coastline_layers, our_basin_layers, color_map):
+    """Add Dürr catchments, Dürr coastline and our basins as feature groups to a map"""
+    # Create feature groups for checkbox control
+    durr_catchments_group = folium.FeatureGroup(name='📊 Dürr Catchments (Original 2011)', show=False)
+    our_basins_group = folium.FeatureGroup(name='🌊 Our Tidal Basins (High-Resolution)', show=True)
+    durr_coastline_group = folium.FeatureGroup(name='📍 Dürr Coastline (Reference)', show=True)
+    
+    # Style dicts are built once per type (folium calls style_function per feature)
+    # Layer 1: Dürr catchments (in feature group)
+    for etype, layer in durr_catchment_layers.items():
+        color = color_map.get(etype, '#808080')
+        style = {
+            'fillColor': color,
+            'color': color,
+            'weight': 2,
+            'fillOpacity': 0.25,
+            'opacity': 0.7,
+            'dashArray': '5, 5'
+        }
+        
+        folium.GeoJson(
+            layer,
+            name=f'{etype}',
+            style_function=lambda x, s=style: s,
+            tooltip=folium.GeoJsonTooltip(
+                fields=['RECORDNAME', 'estuary_type', 'area_km2'],
+                aliases=['Name', 'Dürr Type', 'Area (km²)']
+            )
+        ).add_to(durr_catchments_group)
+    
+    # Layer 2: Dürr coastline (in feature group)
+    for etype, layer in durr_coastline_layers.items():
+        color = color_map.get(etype, '#808080')
+        style = {
+            'color': color,
+            'weight': 3,
+            'opacity': 0.9
+        }
+        
+        folium.GeoJson(
+            layer,
+            name=f'{etype}',
+            style_function=lambda x, s=style: s
+        ).add_to(durr_coastline_group)
+    
+    # Layer 3: Our tidal basins (in feature group)
+    for etype, layer in our_basin_layers.items():
+        color = color_map.get(etype, '#808080')
+        style = {
+            'fillColor': color,
+            'color': 'none',
+            'fillOpacity': 0.4
+        }
+        
+        folium.GeoJson(
+            layer,
+            name=f'{etype}',
+            style_function=lambda x, s=style: s,
+            tooltip=folium.GeoJsonTooltip(
+                fields=['estuary_name', 'estuary_type', 'basin_area_km2'],
+                aliases=['Estuary', 'Type', 'Area (km²)']
+            )
+        ).add_to(our_basins_group)
+    
+    # Add feature groups to map
+    durr_catchments_group.add_to(m)
+    durr_coastline_group.add_to(m)
+    our_basins_group.add_to(m)
+
 # ==============================================================================
 # STEP 6: CREATE VISUALIZATION
 # ==============================================================================
@@ -429,7 +546,8 @@ def create_visualization(tidal_basins, grit_rivers=None, durr_coastline=None):
     durr_catchments = None
     if DURR_CATCHMENT_FILE.exists():
         print(f"\n   Loading Dürr catchments for reference...")
-        durr_catchments = gpd.read_file(DURR_CATCHMENT_FILE)
+        # Normalize CRS once at load; areas below use their own equal-area projection
+        durr_catchments = gpd.read_file(DURR_CATCHMENT_FILE).to_crs(tidal_basins.crs)
         
         # Map types - CORRECT MAPPING FROM DÜRR DOCUMENTATION!
         type_map = {
@@ -444,22 +562,22 @@ def create_visualization(tidal_basins, grit_rivers=None, durr_coastline=None):
             7: 'Arheic',                    # Type VII
             -9999: 'Unclassified'
         }
-        durr_catchments['estuary_type'] = durr_catchments['FIN_TYP'].map(type_map)
+        durr_catchments['estuary_type'] = pd.Categorical(
+            durr_catchments['FIN_TYP'], categories=list(type_map)
+        ).rename_categories(type_map)
         durr_catchments = durr_catchments[
             (durr_catchments['estuary_type'] != 'Unclassified') &
             (durr_catchments['estuary_type'] != 'Endorheic or Glaciated')
         ].copy()
+        durr_catchments['estuary_type'] = durr_catchments['estuary_type'].cat.remove_unused_categories()
         
         # Calculate area for pie chart - MUST reproject to equal area projection!
         print(f"     Calculating areas in equal-area projection...")
-        durr_catchments_aea = durr_catchments.to_crs('ESRI:54009')  # World Mollweide equal area
-        durr_catchments['area_km2'] = durr_catchments_aea.geometry.area / 1e6
+        durr_catchments['area_km2'] = area_km2(durr_catchments.geometry)
         
         durr_catchments = durr_catchments[['RECORDNAME', 'estuary_type', 'area_km2', 'geometry']].copy()
         print(f"     Total Dürr area: {durr_catchments['area_km2'].sum():,.0f} km²")
         
-        if durr_catchments.crs != tidal_basins.crs:
-            durr_catchments = durr_catchments.to_crs(tidal_basins.crs)
         durr_catchments['geometry'] = durr_catchments.geometry.simplify(0.05)
         print(f"     Dürr catchments: {len(durr_catchments):,}")
         print(f"     Types: {durr_catchments['estuary_type'].value_counts().to_dict()}")
@@ -488,11 +606,11 @@ def create_visualization(tidal_basins, grit_rivers=None, durr_coastline=None):
         print(f"\n   Preparing Dürr coastline for visualization...")
         
         # CRITICAL: Keep only unique columns to avoid duplicates error
+        # (already in the basins' CRS - classify_with_durr reprojects it)
         durr_coastline = durr_coastline[['estuary_type', 'geometry']].copy()
         
-        if durr_coastline.crs != tidal_simple.crs:
-            durr_coastline = durr_coastline.to_crs(tidal_simple.crs)
-        durr_coastline['geometry'] = durr_coastline.geometry.simplify(0.02)
+        # Lines cannot self-intersect into invalid polygons - plain Douglas-Peucker is safe
+        durr_coastline['geometry'] = durr_coastline.geometry.simplify(0.02, preserve_topology=False)
         print(f"     Dürr coastline segments: {len(durr_coastline):,}")
         print(f"     Types: {durr_coastline['estuary_type'].value_counts().to_dict()}")
     
@@ -501,111 +619,58 @@ def create_visualization(tidal_basins, grit_rivers=None, durr_coastline=None):
     # =========================================================================
     print(f"\n   Calculating statistics for pie charts...")
     
-    # Our basins statistics
-    our_stats = tidal_simple.groupby('estuary_type')['basin_area_km2'].sum().to_dict()
-    our_total = sum(our_stats.values())
+    # Our basins statistics (area per type, largest first)
+    our_stats = (tidal_simple.groupby('estuary_type', observed=True)['basin_area_km2']
+                 .sum().sort_values(ascending=False))
+    our_total = our_stats.sum()
     
     # Dürr catchments statistics
-    durr_stats = {}
+    durr_stats = pd.Series(dtype=float)
     if durr_catchments is not None:
-        durr_stats = durr_catchments.groupby('estuary_type')['area_km2'].sum().to_dict()
-    durr_total = sum(durr_stats.values()) if durr_stats else 0
+        durr_stats = (durr_catchments.groupby('estuary_type', observed=True)['area_km2']
+                      .sum().sort_values(ascending=False))
+    durr_total = durr_stats.sum()
     
     # =========================================================================
-    # VERSION 1: WITH PIE CHARTS AND CHECKBOX CONTROL (FOR WEB HOSTING)
+    # SERIALIZE LAYERS ONCE PER TYPE (REUSED BY BOTH MAP VERSIONS)
     # =========================================================================
-    print(f"\n   Creating VERSION 1: With pie charts and layer control...")
-    m1 = folium.Map(location=[10, 0], zoom_start=2, tiles='Esri WorldImagery')
-    
-    # Create feature groups for checkbox control
-    durr_catchments_group = folium.FeatureGroup(name='📊 Dürr Catchments (Original 2011)', show=False)
-    our_basins_group = folium.FeatureGroup(name='🌊 Our Tidal Basins (High-Resolution)', show=True)
-    durr_coastline_group = folium.FeatureGroup(name='📍 Dürr Coastline (Reference)', show=True)
-    
-    # Layer 1: Dürr catchments (in feature group)
+    # Only tooltip fields are embedded - the HTML carries no unused attributes
+    print(f"\n   Serializing layers by estuary type...")
+    durr_catchment_layers = {}
     if durr_catchments is not None:
-        for etype in sorted(durr_catchments['estuary_type'].unique()):
-            if pd.isna(etype):
-                continue
-            catchment_type = durr_catchments[durr_catchments['estuary_type'] == etype].copy()
-            color = color_map.get(etype, '#808080')
-            
-            folium.GeoJson(
-                catchment_type.__geo_interface__,
-                name=f'{etype}',
-                style_function=lambda x, c=color: {
-                    'fillColor': c,
-                    'color': c,
-                    'weight': 2,
-                    'fillOpacity': 0.25,
-                    'opacity': 0.7,
-                    'dashArray': '5, 5'
-                },
-                tooltip=folium.GeoJsonTooltip(
-                    fields=['RECORDNAME', 'estuary_type', 'area_km2'],
-                    aliases=['Name', 'Dürr Type', 'Area (km²)']
-                )
-            ).add_to(durr_catchments_group)
-    
-    # Layer 2: Dürr coastline (in feature group)
+        durr_catchment_layers = geojson_layers_by_type(
+            durr_catchments, ['RECORDNAME', 'estuary_type', 'area_km2']
+        )
+    durr_coastline_layers = {}
     if durr_coastline is not None:
-        for etype in sorted(durr_coastline['estuary_type'].unique()):
-            if pd.isna(etype):
-                continue
-            coastline_type = durr_coastline[durr_coastline['estuary_type'] == etype].copy()
-            color = color_map.get(etype, '#808080')
-            
-            folium.GeoJson(
-                coastline_type.__geo_interface__,
-                name=f'{etype}',
-                style_function=lambda x, c=color: {
-                    'color': c,
-                    'weight': 3,
-                    'opacity': 0.9
-                }
-            ).add_to(durr_coastline_group)
+        durr_coastline_layers = geojson_layers_by_type(durr_coastline, ['estuary_type'])
+    our_basin_layers = geojson_layers_by_type(
+        tidal_simple, ['estuary_name', 'estuary_type', 'basin_area_km2']
+    )
     
-    # Layer 3: Our tidal basins (in feature group)
-    for etype in sorted(tidal_simple['estuary_type'].unique()):
-        if pd.isna(etype):
-            continue
-        
-        type_data = tidal_simple[tidal_simple['estuary_type'] == etype]
-        color = color_map.get(etype, '#808080')
-        
-        folium.GeoJson(
-            type_data.__geo_interface__,
-            name=f'{etype}',
-            style_function=lambda x, c=color: {
-                'fillColor': c,
-                'color': 'none',
-                'fillOpacity': 0.4
-            },
-            tooltip=folium.GeoJsonTooltip(
-                fields=['estuary_name', 'estuary_type', 'basin_area_km2'],
-                aliases=['Estuary', 'Type', 'Area (km²)']
-            )
-        ).add_to(our_basins_group)
+    # =========================================================================
+    # VERSION 1: WITH PIE CHARTS AND CHECKBOX CONTROL (FOR WEB HOSTING)
+    # =========================================================================
+    print(f"\n   Creating VERSION 1: With pie charts and layer control...")
+    m1 = folium.Map(location=[10, 0], zoom_start=2, tiles='Esri WorldImagery')
     
-    # Add feature groups to map
-    durr_catchments_group.add_to(m1)
-    durr_coastline_group.add_to(m1)
-    our_basins_group.add_to(m1)
+    # Dürr catchments, Dürr coastline and our basins (checkbox-controlled groups)
+    add_type_layers(m1, durr_catchment_layers, durr_coastline_layers, our_basin_layers, color_map)
     
     # Add layer control with checkbox
     folium.LayerControl(collapsed=False).add_to(m1)
     plugins.Fullscreen().add_to(m1)
     
     # Prepare data for pie charts
-    our_labels = [t for t in sorted(our_stats.keys(), key=lambda x: our_stats[x], reverse=True)]
-    our_values = [our_stats[t] for t in our_labels]
+    our_labels = our_stats.index.tolist()
+    our_values = our_stats.tolist()
     our_colors = [color_map.get(t, '#ccc') for t in our_labels]
-    our_percentages = [f"{(v/our_total*100):.1f}%" for v in our_values]
+    our_percentages = (our_stats / our_total * 100).map('{:.1f}%'.format).tolist()
     
-    durr_labels = [t for t in sorted(durr_stats.keys(), key=lambda x: durr_stats[x], reverse=True)] if durr_stats else []
-    durr_values = [durr_stats[t] for t in durr_labels] if durr_stats else []
-    durr_colors = [color_map.get(t, '#ccc') for t in durr_labels] if durr_stats else []
-    durr_percentages = [f"{(v/durr_total*100):.1f}%" for v in durr_values] if durr_total > 0 else []
+    durr_labels = durr_stats.index.tolist()
+    durr_values = durr_stats.tolist()
+    durr_colors = [color_map.get(t, '#ccc') for t in durr_labels]
+    durr_percentages = (durr_stats / durr_total * 100).map('{:.1f}%'.format).tolist() if durr_total > 0 else []
     
     # Add pie charts as HTML overlay - BOTTOM RIGHT with Chart.js
     pie_html = f"""
@@ -754,81 +819,25 @@ def create_visualization(tidal_basins, grit_rivers=None, durr_coastline=None):
         
         print(f"   Filtered to {len(grit_large):,} large rivers (order >= 6 or mainstem)")
         
-        # Spatial join to keep only rivers within tidal basins
+        # Keep only rivers touching tidal basins: one bulk STRtree query on the
+        # river lines themselves (no centroid pass, no sjoin frame). The tree
+        # holds the rivers and the prepared basin polygons are the queries, so
+        # each intersects test runs against a prepared (edge-indexed) polygon.
         if grit.crs != tidal_simple.crs:
             grit_large = grit_large.to_crs(tidal_simple.crs)
         
-        grit_points = grit_large.copy()
-        grit_points['geometry'] = grit_points.geometry.centroid
-        
-        grit_in_basins = gpd.sjoin(
-            grit_points[['global_id', 'strahler_order', 'is_mainstem', 'geometry']],
-            tidal_simple[['HYBAS_ID', 'geometry']],
-            how='inner',
-            predicate='within'
-        )
-        
-        # Get full river segments for matched IDs
-        river_ids = grit_in_basins['global_id'].unique()
-        grit_rivers_filtered = grit_large[grit_large['global_id'].isin(river_ids)].copy()
-        grit_rivers_filtered['geometry'] = grit_rivers_filtered.geometry.simplify(0.01)
+        basin_geoms = tidal_simple.geometry.values
+        shapely.prepare(basin_geoms)
+        river_tree = shapely.STRtree(grit_large.geometry.values)
+        _, river_idx = river_tree.query(basin_geoms, predicate='intersects')
+        grit_rivers_filtered = grit_large.iloc[np.unique(river_idx)].copy()
+        grit_rivers_filtered['geometry'] = grit_rivers_filtered.geometry.simplify(0.01, preserve_topology=False)
         
         print(f"   Rivers within tidal basins: {len(grit_rivers_filtered):,}")
     
     m2 = folium.Map(location=[10, 0], zoom_start=2, tiles='Esri WorldImagery')
     
-    # Create feature groups
-    durr_catchments_group2 = folium.FeatureGroup(name='📊 Dürr Catchments (Original 2011)', show=False)
-    our_basins_group2 = folium.FeatureGroup(name='🌊 Our Tidal Basins (High-Resolution)', show=True)
-    durr_coastline_group2 = folium.FeatureGroup(name='📍 Dürr Coastline (Reference)', show=True)
-    
-    # Add layers to groups
-    if durr_catchments is not None:
-        for etype in sorted(durr_catchments['estuary_type'].unique()):
-            if pd.isna(etype):
-                continue
-            catchment_type = durr_catchments[durr_catchments['estuary_type'] == etype].copy()
-            color = color_map.get(etype, '#808080')
-            folium.GeoJson(
-                catchment_type.__geo_interface__,
-                style_function=lambda x, c=color: {
-                    'fillColor': c, 'color': c, 'weight': 2,
-                    'fillOpacity': 0.25, 'opacity': 0.7, 'dashArray': '5, 5'
-                },
-                tooltip=folium.GeoJsonTooltip(
-                    fields=['RECORDNAME', 'estuary_type', 'area_km2'],
-                    aliases=['Name', 'Dürr Type', 'Area (km²)']
-                )
-            ).add_to(durr_catchments_group2)
-    
-    if durr_coastline is not None:
-        for etype in sorted(durr_coastline['estuary_type'].unique()):
-            if pd.isna(etype):
-                continue
-            coastline_type = durr_coastline[durr_coastline['estuary_type'] == etype].copy()
-            color = color_map.get(etype, '#808080')
-            folium.GeoJson(
-                coastline_type.__geo_interface__,
-                style_function=lambda x, c=color: {'color': c, 'weight': 3, 'opacity': 0.9}
-            ).add_to(durr_coastline_group2)
-    
-    for etype in sorted(tidal_simple['estuary_type'].unique()):
-        if pd.isna(etype):
-            continue
-        type_data = tidal_simple[tidal_simple['estuary_type'] == etype]
-        color = color_map.get(etype, '#808080')
-        folium.GeoJson(
-            type_data.__geo_interface__,
-            style_function=lambda x, c=color: {'fillColor': c, 'color': 'none', 'fillOpacity': 0.4},
-            tooltip=folium.GeoJsonTooltip(
-                fields=['estuary_name', 'estuary_type', 'basin_area_km2'],
-                aliases=['Estuary', 'Type', 'Area (km²)']
-            )
-        ).add_to(our_basins_group2)
-    
-    durr_catchments_group2.add_to(m2)
-    durr_coastline_group2.add_to(m2)
-    our_basins_group2.add_to(m2)
+    add_type_layers(m2, durr_catchment_layers, durr_coastline_layers, our_basin_layers, color_map)
     
     # Add rivers layer
     if grit_rivers_filtered is not None and len(grit_rivers_filtered) > 0:
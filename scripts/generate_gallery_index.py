@@ -10,6 +10,7 @@ Usage:
 """
 
 import json
+import re
 from pathlib import Path
 from datetime import datetime
 import os
@@ -18,58 +19,70 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 HTML_DIR = BASE_DIR / 'diagnostics_html'
 OUTPUT_DIR = BASE_DIR / 'data'
 OUTPUT_FILE = OUTPUT_DIR / 'gallery_index.json'
+TITLE_SEPARATORS = str.maketrans('_-', '  ')
+
+# Category patterns (order matters - more specific first)
+CATEGORY_PATTERNS = [
+    (['tidal', 'basin'], 'Tidal Basin Analysis'),
+    (['river', 'grit', 'stream'], 'River Network Analysis'),
+    (['coast'], 'Coastal Analysis'),  # also matches 'coastal'
+    (['salinity', 'globsalt'], 'Salinity Classification'),
+    (['morphometry', 'baum'], 'Morphometry'),
+    (['durr', 'estuary', 'estuarine'], 'Estuary Typology'),  # not 'estuar': keeps 'estuaries' out
+    (['dynqual'], 'DynQual Hydrology'),
+    (['gcc'], 'Coastal Characteristics (GCC)'),
+    (['map', 'web'], 'Interactive Maps'),
+    (['notebook', 'analysis'], 'Jupyter Notebooks'),
+    (['validation', 'verify'], 'Validation & QA'),
+]
+
+# Single compiled matcher: alternation branches are tried in pattern order, so
+# the first category with any keyword in the filename wins
+CATEGORY_RE = re.compile('|'.join(
+    f"(?=.*(?:{'|'.join(map(re.escape, keywords))}))(?P<c{i}>)"
+    for i, (keywords, _) in enumerate(CATEGORY_PATTERNS)
+))
 
 def categorize_file(filename):
     """Auto-categorize based on filename patterns"""
-    filename_lower = filename.lower()
-    
-    # Category patterns (order matters - more specific first)
-    patterns = [
-        (['tidal', 'basin'], 'Tidal Basin Analysis'),
-        (['river', 'grit', 'stream'], 'River Network Analysis'),
-        (['coastal', 'coast'], 'Coastal Analysis'),
-        (['salinity', 'globsalt'], 'Salinity Classification'),
-        (['morphometry', 'baum'], 'Morphometry'),
-        (['durr', 'estuary', 'estuarine'], 'Estuary Typology'),
-        (['dynqual'], 'DynQual Hydrology'),
-        (['gcc'], 'Coastal Characteristics (GCC)'),
-        (['map', 'web'], 'Interactive Maps'),
-        (['notebook', 'analysis'], 'Jupyter Notebooks'),
-        (['validation', 'verify'], 'Validation & QA'),
-    ]
-    
-    for keywords, category in patterns:
-        if any(keyword in filename_lower for keyword in keywords):
-            return category
+    match = CATEGORY_RE.match(filename.lower())
+    if match:
+        return CATEGORY_PATTERNS[int(match.lastgroup[1:])][1]
     
     return 'General Visualizations'
 
-def generate_title(filename):
-    """Generate human-readable title from filename"""
-    # Remove extension
-    name = Path(filename).stem
-    
-    # Replace underscores and hyphens with spaces
-    name = name.replace('_', ' ').replace('-', ' ')
+def generate_title(stem):
+    """Generate human-readable title from a filename stem"""
+    # Replace underscores and hyphens with spaces (one translate pass)
+    name = stem.translate(TITLE_SEPARATORS)
     
     # Capitalize words
     return ' '.join(word.capitalize() for word in name.split())
 
-def get_file_info(html_file):
+def find_html_files(directory):
+    """Recursively yield (path, stat) for HTML files, reusing scandir's cached stat"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from find_html_files(entry.path)
+            elif entry.name.endswith('.html'):
+                yield Path(entry.path), entry.stat()
+
+def get_file_info(html_file, file_stat):
     """Get metadata for a single HTML file"""
     relative_path = html_file.relative_to(BASE_DIR).as_posix()
     filename = html_file.name
     
     # Get file size
-    size_bytes = html_file.stat().st_size
+    size_bytes = file_stat.st_size
     size_mb = size_bytes / (1024 * 1024)
     
     # Get modification time
-    mtime = html_file.stat().st_mtime
+    mtime = file_stat.st_mtime
     modified = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d')
     
     return {
-        'title': generate_title(filename),
+        'title': generate_title(html_file.stem),
         'path': '/' + relative_path,  # Add leading slash for absolute path
         'filename': filename,
         'size_mb': round(size_mb, 2),
@@ -91,14 +104,14 @@ def generate_gallery_index():
     gallery_items = []
     
     # Find all HTML files
-    html_files = list(HTML_DIR.rglob('*.html'))
+    html_files = list(find_html_files(HTML_DIR))
     
     print(f"   Found {len(html_files)} HTML files\n")
     
     # Process each file
-    for html_file in html_files:
+    for html_file, file_stat in html_files:
         try:
-            item = get_file_info(html_file)
+            item = get_file_info(html_file, file_stat)
             gallery_items.append(item)
             print(f"   ✓ {item['filename']}")
         except Exception as e:
@@ -110,9 +123,9 @@ def generate_gallery_index():
     # Create output directory if needed
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
-    # Write JSON file
+    # Write compact JSON (fetched by the navigation menu on every page)
     with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(gallery_items, f, indent=2, ensure_ascii=False)
+        json.dump(gallery_items, f, ensure_ascii=False, separators=(',', ':'))
     
     print(f"\n{'='*80}")
     print(f"✅ SUCCESS")
@@ -19,6 +19,11 @@ Date: October 10, 2025
 
 import geopandas as gpd
 import pandas as pd
+import numpy as np
+import pyogrio
+import shapely
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
@@ -48,6 +53,27 @@ SALINITY_RANGES = {
     'hyperhaline': '>35 ppt'
 }
 
+def add_salinity_styling(gdf):
+    """Add color and salinity_range columns by gathering on salinity zone codes"""
+    # Unknown zones get code -1, which picks the trailing None (same as .map)
+    codes = pd.Categorical(gdf['salinity_zone'], categories=list(SALINITY_COLORS)).codes
+    gdf['color'] = np.array([*SALINITY_COLORS.values(), None], dtype=object)[codes]
+    gdf['salinity_range'] = np.array(
+        [*(SALINITY_RANGES[zone] for zone in SALINITY_COLORS), None], dtype=object
+    )[codes]
+    return gdf
+
+def simplify_parallel(geometries, tolerance):
+    """Simplify a GeoSeries in chunks across threads (shapely 2 releases the GIL)"""
+    # Plain object array (not GeometryArray) and no empty chunks for small inputs
+    n_chunks = max(1, min(os.cpu_count() or 1, len(geometries)))
+    chunks = np.array_split(np.asarray(geometries.values), n_chunks)
+    with ThreadPoolExecutor() as executor:
+        parts = list(executor.map(
+            lambda chunk: shapely.simplify(chunk, tolerance, preserve_topology=True), chunks
+        ))
+    return gpd.GeoSeries(np.concatenate(parts), index=geometries.index, crs=geometries.crs)
+
 def load_salinity_points():
     """Load salinity data (currently points with HYBAS_ID)"""
     print("📂 Loading salinity points...")
@@ -56,9 +82,11 @@ def load_salinity_points():
     if not salinity_file.exists():
         salinity_file = PROCESSED_DIR / 'salinity_zones.gpkg'
     
-    gdf = gpd.read_file(salinity_file)
+    # Attributes only - point geometries are never used downstream
+    gdf = gpd.read_file(salinity_file, engine='pyogrio', use_arrow=True,
+                        ignore_geometry=True, columns=['HYBAS_ID', 'salinity_zone', 'salinity_ppt'])
     print(f"   ✓ Loaded {len(gdf)} salinity points")
-    print(f"   Geometry type: {gdf.geometry.geom_type.unique()}")
+    print(f"   Geometry type: {pyogrio.read_info(salinity_file)['geometry_type']}")
     
     # Extract salinity attributes
     salinity_data = gdf[['HYBAS_ID', 'salinity_zone']].drop_duplicates()
@@ -83,27 +111,31 @@ def join_salinity_with_basins(salinity_data):
         print("   ❌ Basins file not found!")
         return None
     
-    basins = gpd.read_file(basins_file)
+    # Fix type mismatch: convert both to int64
+    salinity_data['HYBAS_ID'] = salinity_data['HYBAS_ID'].astype('int64')
+    
+    # Only the join key is needed; basins without salinity drop out in the inner join
+    # (an OGR "HYBAS_ID IN (...)" filter fails on GeoJSON for thousands of IDs)
+    basins = gpd.read_file(basins_file, engine='pyogrio', use_arrow=True,
+                           columns=['HYBAS_ID'])
     print(f"   ✓ Loaded {len(basins)} basin polygons")
     
-    # Fix type mismatch: convert both to int64
     basins['HYBAS_ID'] = basins['HYBAS_ID'].astype('int64')
-    salinity_data['HYBAS_ID'] = salinity_data['HYBAS_ID'].astype('int64')
     
     # Join with salinity data
     print("\n🔗 Joining salinity data with basins...")
-    basins_salinity = basins.merge(salinity_data, on='HYBAS_ID', how='inner')
+    # Hash join against the HYBAS_ID-indexed salinity table
+    basins_salinity = basins.join(salinity_data.set_index('HYBAS_ID'), on='HYBAS_ID', how='inner')
     
     print(f"   ✓ Matched {len(basins_salinity)} basins with salinity data")
     print(f"   Geometry type: {basins_salinity.geometry.geom_type.unique()}")
     
     # Add color attribute
-    basins_salinity['color'] = basins_salinity['salinity_zone'].map(SALINITY_COLORS)
-    basins_salinity['salinity_range'] = basins_salinity['salinity_zone'].map(SALINITY_RANGES)
+    basins_salinity = add_salinity_styling(basins_salinity)
     
     # Simplify for web
     print("\n   ✂️  Simplifying geometries for web...")
-    basins_salinity['geometry'] = basins_salinity['geometry'].simplify(0.02, preserve_topology=True)
+    basins_salinity['geometry'] = simplify_parallel(basins_salinity.geometry, 0.02)
     
     # Keep only essential attributes
     columns_to_keep = ['HYBAS_ID', 'salinity_zone', 'salinity_range', 'color', 'geometry']
@@ -113,8 +145,8 @@ def join_salinity_with_basins(salinity_data):
     basins_salinity = basins_salinity[[col for col in columns_to_keep if col in basins_salinity.columns]]
     
     # Save
-    output_file = OPTIMIZED_DIR / 'salinity_basins.geojson'
-    basins_salinity.to_file(output_file, driver='GeoJSON')
+    output_file = OPTIMIZED_DIR / 'salinity_basins.fgb'
+    basins_salinity.to_file(output_file, driver='FlatGeobuf', engine='pyogrio', use_arrow=True)
     
     output_size = output_file.stat().st_size / (1024 * 1024)
     print(f"   ✓ Saved: {output_file.name} ({output_size:.1f} MB)")
@@ -133,33 +165,31 @@ def join_salinity_with_rivers(salinity_data):
         print("   ❌ Rivers file not found!")
         return None
     
-    # Rivers are large - read in chunks or use pyogrio
-    try:
-        import pyogrio
-        rivers = gpd.read_file(rivers_file, engine='pyogrio')
-    except:
-        rivers = gpd.read_file(rivers_file)
-    
-    print(f"   ✓ Loaded {len(rivers)} river segments")
-    
     # Rivers don't have HYBAS_ID, need to join by spatial intersection or MAIN_BAS
-    # For now, if rivers have basin ID in attributes
-    if 'HYBAS_ID' in rivers.columns or 'MAIN_BAS' in rivers.columns:
-        basin_col = 'HYBAS_ID' if 'HYBAS_ID' in rivers.columns else 'MAIN_BAS'
+    # For now, if rivers have basin ID in attributes (checked from the layer schema)
+    river_fields = pyogrio.read_info(rivers_file)['fields']
+    if 'HYBAS_ID' in river_fields or 'MAIN_BAS' in river_fields:
+        basin_col = 'HYBAS_ID' if 'HYBAS_ID' in river_fields else 'MAIN_BAS'
+        
+        # Rivers are large - read just the ID/join/length columns; rivers outside
+        # salinity basins drop out in the inner join (an OGR "IN (...)" filter
+        # fails on GeoJSON for thousands of IDs)
+        rivers = gpd.read_file(rivers_file, engine='pyogrio', use_arrow=True,
+                               columns=['HYRIV_ID', 'LENGTH_KM', basin_col])
+        
+        print(f"   ✓ Loaded {len(rivers)} river segments")
         
         print(f"\n🔗 Joining salinity data with rivers (by {basin_col})...")
-        rivers_salinity = rivers.merge(
-            salinity_data, 
-            left_on=basin_col, 
-            right_on='HYBAS_ID', 
+        rivers_salinity = rivers.join(
+            salinity_data.set_index('HYBAS_ID'),
+            on=basin_col,
             how='inner'
         )
         
         print(f"   ✓ Matched {len(rivers_salinity)} rivers with salinity data")
         
         # Add color attribute
-        rivers_salinity['color'] = rivers_salinity['salinity_zone'].map(SALINITY_COLORS)
-        rivers_salinity['salinity_range'] = rivers_salinity['salinity_zone'].map(SALINITY_RANGES)
+        rivers_salinity = add_salinity_styling(rivers_salinity)
         
         # Keep only essential attributes
         columns_to_keep = ['HYRIV_ID', 'salinity_zone', 'salinity_range', 'color', 'geometry']
@@ -171,8 +201,8 @@ def join_salinity_with_rivers(salinity_data):
         rivers_salinity = rivers_salinity[[col for col in columns_to_keep if col in rivers_salinity.columns]]
         
         # Save
-        output_file = OPTIMIZED_DIR / 'salinity_rivers.geojson'
-        rivers_salinity.to_file(output_file, driver='GeoJSON')
+        output_file = OPTIMIZED_DIR / 'salinity_rivers.fgb'
+        rivers_salinity.to_file(output_file, driver='FlatGeobuf', engine='pyogrio', use_arrow=True)
         
         output_size = output_file.stat().st_size / (1024 * 1024)
         print(f"   ✓ Saved: {output_file.name} ({output_size:.1f} MB)")
@@ -182,18 +212,21 @@ def join_salinity_with_rivers(salinity_data):
         print("   ⚠️ Rivers don't have basin ID - spatial join needed (slow)")
         return None
 
-def create_summary():
-    """Create summary of salinity distribution"""
+def create_summary(basins_salinity=None, rivers_salinity=None):
+    """Create summary of salinity distribution (reuses in-memory layers when given)"""
     print("\n" + "="*80)
     print("📊 SALINITY DATA SUMMARY")
     print("="*80)
     
     # Check created files
-    basins_file = OPTIMIZED_DIR / 'salinity_basins.geojson'
-    rivers_file = OPTIMIZED_DIR / 'salinity_rivers.geojson'
+    basins_file = OPTIMIZED_DIR / 'salinity_basins.fgb'
+    rivers_file = OPTIMIZED_DIR / 'salinity_rivers.fgb'
     
     if basins_file.exists():
-        basins = gpd.read_file(basins_file)
+        basins = basins_salinity
+        if basins is None:
+            basins = gpd.read_file(basins_file, engine='pyogrio', use_arrow=True,
+                                   ignore_geometry=True, columns=['salinity_zone'])
         print(f"\n✅ Salinity Basins: {len(basins)} polygons")
         print("\n   Distribution:")
         for zone, count in basins['salinity_zone'].value_counts().items():
@@ -205,7 +238,10 @@ def create_summary():
         print(f"\n   📦 File size: {size_mb:.1f} MB")
     
     if rivers_file.exists():
-        rivers = gpd.read_file(rivers_file)
+        rivers = rivers_salinity
+        if rivers is None:
+            rivers = gpd.read_file(rivers_file, engine='pyogrio', use_arrow=True,
+                                   ignore_geometry=True, columns=['salinity_zone'])
         print(f"\n✅ Salinity Rivers: {len(rivers)} lines")
         print("\n   Distribution:")
         for zone, count in rivers['salinity_zone'].value_counts().items():
@@ -220,7 +256,7 @@ def create_summary():
     print("✅ SALINITY GEOMETRIES CREATED!")
     print("="*80)
     print("\n💡 Next:")
-    print("   1. Update map.js to load salinity_basins.geojson and salinity_rivers.geojson")
+    print("   1. Update map.js to load salinity_basins.fgb and salinity_rivers.fgb (flatgeobuf)")
     print("   2. Color polygons/lines by 'color' attribute")
     print("   3. Show 'salinity_range' in legend")
     print("   4. Make layers toggleable")
@@ -243,7 +279,7 @@ def main():
     rivers_salinity = join_salinity_with_rivers(salinity_data)
     
     # Create summary
-    create_summary()
+    create_summary(basins_salinity, rivers_salinity)
     
     print("\n✨ Now your map can show:")
     print("   • Basins colored by salinity (polygons)")
@@ -12,21 +12,35 @@ Data sources:
 This script processes real estuary datasets and generates a GeoJSON file
 with estuary locations and their classifications.
 
+Full-resolution basin polygons are written to basins.gpkg; pass
+--emit-full-geojson to also write them as basins.geojson. GeoJSON outputs
+are written as plain .geojson; pass --gzip to also write gzip-compressed
+.geojson.gz copies alongside them.
+
 Note: Laruelle et al. (2025) is used only for validation and global area
 statistics. No shape, polygon, or direct attribute data is used from that study.
 """
 
+import argparse
+import gzip
 import json
+import re
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import repeat
 from pathlib import Path
 
 try:
     import geopandas as gpd
+    import numpy as np
     import pandas as pd
+    import pyogrio
+    import shapely
 except ImportError as e:
     print(f"Error: Required packages not installed: {e}", file=sys.stderr)
-    print("Please install: pip install geopandas pandas pyproj", file=sys.stderr)
+    print("Please install: pip install geopandas numpy pandas pyogrio pyproj shapely", file=sys.stderr)
     sys.exit(1)
 
 
@@ -56,31 +70,71 @@ SIMPLE_TYPE_MAP = {
     7: "Coastal Plain"
 }
 
+# OGR filters (and coastline columns) applied while reading the Dürr shapefiles
+# Focus on types 1-6, 51 (actual coastal systems) and named basins > 100 km²
+# Catchments keep every attribute: basins.gpkg carries the full Dürr schema
+DURR_CATCHMENT_WHERE = (
+    "FIN_TYP IN (1, 2, 3, 4, 5, 6, 51) AND BASINAREA > 100 "
+    "AND RECORDNAME IS NOT NULL AND RECORDNAME <> 'None'"
+)
+DURR_COASTLINE_COLUMNS = ["FIN_TYP", "LENGTH"]
+DURR_COASTLINE_WHERE = "FIN_TYP IN (1, 2, 3, 4, 5, 6)"
+
+# The GeoJSON driver's FOREIGN_MEMBERS_COLLECTION option was added in GDAL 3.9
+GDAL_FOREIGN_MEMBERS_VERSION = (3, 9, 0)
+
+# Simplification tolerance (degrees) for the web basin polygons
+SIMPLIFY_TOLERANCE = 0.05
+
+# Output coordinate grid (degrees), i.e. 4 decimal places
+COORDINATE_GRID = 1e-4
+
+# Trailing ".0" GEOS writes after integral coordinates
+INTEGRAL_FLOAT_RE = re.compile(r'\.0(?=[,\]])')
+
+# Data source entries shared by the output metadata blocks
+DURR_SOURCE = {
+    "name": "Dürr et al. (2011)",
+    "title": "Worldwide typology of nearshore coastal systems",
+    "doi": "10.1007/s12237-011-9381-y"
+}
+BAUM_SOURCE = {
+    "name": "Baum et al. (2024)",
+    "title": "Large structural estuaries",
+    "description": "Supplementary morphometry data"
+}
+
+# GeoJSON property keys, in output order
+PROPERTY_KEYS = (
+    "name", "type", "type_detailed", "type_code", "basin_area_km2",
+    "sea_name", "ocean_name", "data_source", "data_source_doi"
+)
+BAUM_PROPERTY_KEYS = (
+    "baum_embayment_name", "baum_mouth_width_m", "baum_length_m",
+    "baum_geomorphotype", "baum_data_source"
+)
 
-def load_durr_data(shapefile_path):
+
+def load_durr_data(shapefile_path, bbox=None):
     """
     Load estuary data from Dürr et al. (2011) shapefile.
     
     Args:
         shapefile_path: Path to the typology_catchments.shp file
+        bbox: Optional (minx, miny, maxx, maxy) region of interest
     
     Returns:
         GeoDataFrame with estuary catchment data
     """
     print(f"Loading Dürr et al. (2011) shapefile: {shapefile_path}")
-    gdf = gpd.read_file(shapefile_path)
-    
-    # Filter to meaningful estuaries (exclude endorheic, glaciated, arheic, unknown)
-    # Focus on types 1-6, 51 (actual coastal systems)
-    valid_types = [1, 2, 3, 4, 5, 6, 51]
-    gdf = gdf[gdf['FIN_TYP'].isin(valid_types)].copy()
-    
-    # Filter to named basins with reasonable area
-    gdf = gdf[
-        (gdf['RECORDNAME'].notna()) & 
-        (gdf['RECORDNAME'] != 'None') &
-        (gdf['BASINAREA'] > 100)  # Filter small unnamed catchments
-    ].copy()
+    # Type, name and area filters run inside OGR (excludes endorheic, glaciated,
+    # arheic, unknown and small unnamed catchments)
+    gdf = gpd.read_file(
+        shapefile_path,
+        engine='pyogrio',
+        where=DURR_CATCHMENT_WHERE,
+        bbox=bbox
+    )
     
     print(f"Found {len(gdf)} valid estuary catchments")
     return gdf
@@ -102,182 +156,278 @@ def load_baum_data(csv_path):
     return df
 
 
-def create_estuary_features(durr_gdf, baum_df=None):
+def match_baum_embayments(names, baum_df):
+    """
+    Match Dürr basin names to Baum et al. (2024) embayments.
+    
+    A Dürr name matches the first Baum embayment whose lowercased name
+    contains it as a substring. Each distinct name is resolved only once.
+    
+    Args:
+        names: Array of Dürr RECORDNAME values
+        baum_df: DataFrame from Baum et al. (2024)
+    
+    Returns:
+        Array of Baum row positions (-1 where there is no match)
+    """
+    embayments = [e.lower() for e in baum_df['Embayment'].dropna()]
+    positions = np.flatnonzero(baum_df['Embayment'].notna().to_numpy())
+    
+    resolved = {}
+    matches = np.full(len(names), -1, dtype=np.int64)
+    for i, name in enumerate(names):
+        key = name.lower()
+        if key not in resolved:
+            resolved[key] = next(
+                (pos for pos, emb in zip(positions, embayments) if key in emb), -1
+            )
+        matches[i] = resolved[key]
+    
+    return matches
+
+
+def build_properties(durr_gdf, baum_df=None):
     """
-    Create GeoJSON features from Dürr data, enriched with Baum data where available.
+    Build GeoJSON properties for Dürr basins, enriched with Baum data where available.
     
     Args:
         durr_gdf: GeoDataFrame from Dürr et al. (2011)
         baum_df: Optional DataFrame from Baum et al. (2024)
     
     Returns:
-        List of GeoJSON features
+        List of property dicts, one per basin
     """
-    features = []
+    # Pull attribute columns out once instead of boxing every row
+    names = durr_gdf['RECORDNAME'].to_numpy()
+    simple_types = durr_gdf['FIN_TYP'].map(SIMPLE_TYPE_MAP).fillna("Unknown").to_numpy()
+    detailed_types = durr_gdf['FIN_TYP'].map(DURR_TYPE_MAP).fillna("Unknown").to_numpy()
+    type_codes = durr_gdf['FIN_TYP'].astype(np.int32).to_numpy()
+    areas = durr_gdf['BASINAREA'].to_numpy()
+    seas = durr_gdf['SEANAME'].to_numpy()
+    oceans = durr_gdf['OCEANNAME'].to_numpy()
+    
+    # Missing values become None (null in GeoJSON)
+    areas = np.where(pd.notna(areas), np.round(areas, 2), None)
+    seas = np.where(pd.notna(seas), seas, None)
+    oceans = np.where(pd.notna(oceans), oceans, None)
+    
+    properties = [
+        dict(zip(PROPERTY_KEYS, values))
+        for values in zip(
+            names, simple_types, detailed_types, type_codes.tolist(), areas, seas, oceans,
+            repeat("Dürr et al. (2011)"), repeat("10.1007/s12237-011-9381-y")
+        )
+    ]
+    
+    # Enrich with Baum data where the names matched
+    if baum_df is not None:
+        baum_values = list(zip(
+            baum_df['Embayment'], baum_df['Lm'], baum_df['Lb'], baum_df['Geomorphotype'],
+            repeat("Baum et al. (2024)")
+        ))
+        baum_matches = match_baum_embayments(names, baum_df)
+        for props, match in zip(properties, baum_matches.tolist()):
+            if match >= 0:
+                props.update(zip(BAUM_PROPERTY_KEYS, baum_values[match]))
+    
+    return properties
+
+
+def create_estuary_features(durr_gdf, properties):
+    """
+    Create GeoJSON point features from Dürr data.
     
-    # Group by basin and aggregate
-    for idx, row in durr_gdf.iterrows():
-        # Get centroid for point representation
-        centroid = row.geometry.centroid
-        
-        # Extract properties
-        properties = {
-            "name": row['RECORDNAME'],
-            "type": SIMPLE_TYPE_MAP.get(row['FIN_TYP'], "Unknown"),  # Simple type for frontend
-            "type_detailed": DURR_TYPE_MAP.get(row['FIN_TYP'], "Unknown"),  # Detailed type
-            "type_code": int(row['FIN_TYP']),
-            "basin_area_km2": round(row['BASINAREA'], 2) if pd.notna(row['BASINAREA']) else None,
-            "sea_name": row['SEANAME'] if pd.notna(row['SEANAME']) else None,
-            "ocean_name": row['OCEANNAME'] if pd.notna(row['OCEANNAME']) else None,
-            "data_source": "Dürr et al. (2011)",
-            "data_source_doi": "10.1007/s12237-011-9381-y"
-        }
-        
-        # Try to match with Baum data if available
-        if baum_df is not None:
-            # Simple name matching (could be improved with fuzzy matching)
-            baum_match = baum_df[
-                baum_df['Embayment'].str.lower().str.contains(
-                    row['RECORDNAME'].lower(), na=False
-                )
-            ]
-            if len(baum_match) > 0:
-                baum_row = baum_match.iloc[0]
-                properties.update({
-                    "baum_embayment_name": baum_row['Embayment'],
-                    "baum_mouth_width_m": baum_row['Lm'],
-                    "baum_length_m": baum_row['Lb'],
-                    "baum_geomorphotype": baum_row['Geomorphotype'],
-                    "baum_data_source": "Baum et al. (2024)"
-                })
-        
-        feature = {
+    Args:
+        durr_gdf: GeoDataFrame from Dürr et al. (2011)
+        properties: Property dicts from build_properties, aligned with durr_gdf
+    
+    Returns:
+        List of GeoJSON features
+    """
+    # Centroids for point representation, computed in a single GEOS call
+    # (shapely directly: GeoSeries.centroid warns on the geographic CRS)
+    centroids = shapely.centroid(durr_gdf.geometry.values)
+    cx = np.round(shapely.get_x(centroids), 4).tolist()
+    cy = np.round(shapely.get_y(centroids), 4).tolist()
+    
+    return [
+        {
             "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [round(centroid.x, 4), round(centroid.y, 4)]
-            },
-            "properties": properties
+            "geometry": {"type": "Point", "coordinates": [x, y]},
+            "properties": props
         }
-        
-        features.append(feature)
-    
-    return features
+        for x, y, props in zip(cx, cy, properties)
+    ]
 
 
-def create_basin_polygon_features(durr_gdf, baum_df=None):
+def create_basin_polygon_features(geometries, properties, integer_coords=False):
     """
     Create GeoJSON features with basin polygons from Dürr data.
     
     Args:
-        durr_gdf: GeoDataFrame from Dürr et al. (2011) with Polygon geometries
-        baum_df: Optional DataFrame from Baum et al. (2024)
+        geometries: Polygon/MultiPolygon geometries (GeoSeries or array)
+        properties: Property dicts from build_properties, aligned with geometries
+        integer_coords: Write coordinates as integers (geometries from quantize_geometries)
     
     Returns:
-        List of GeoJSON features with Polygon/MultiPolygon geometries
+        List of GeoJSON features with Polygon/MultiPolygon geometries,
+        pre-encoded as JSON strings
     """
-    features = []
-    
-    for idx, row in durr_gdf.iterrows():
-        # Extract properties (same as point features)
-        properties = {
-            "name": row['RECORDNAME'],
-            "type": SIMPLE_TYPE_MAP.get(row['FIN_TYP'], "Unknown"),
-            "type_detailed": DURR_TYPE_MAP.get(row['FIN_TYP'], "Unknown"),
-            "type_code": int(row['FIN_TYP']),
-            "basin_area_km2": round(row['BASINAREA'], 2) if pd.notna(row['BASINAREA']) else None,
-            "sea_name": row['SEANAME'] if pd.notna(row['SEANAME']) else None,
-            "ocean_name": row['OCEANNAME'] if pd.notna(row['OCEANNAME']) else None,
-            "data_source": "Dürr et al. (2011)",
-            "data_source_doi": "10.1007/s12237-011-9381-y"
-        }
-        
-        # Try to match with Baum data if available
-        if baum_df is not None:
-            baum_match = baum_df[
-                baum_df['Embayment'].str.lower().str.contains(
-                    row['RECORDNAME'].lower(), na=False
-                )
-            ]
-            if len(baum_match) > 0:
-                baum_row = baum_match.iloc[0]
-                properties.update({
-                    "baum_embayment_name": baum_row['Embayment'],
-                    "baum_mouth_width_m": baum_row['Lm'],
-                    "baum_length_m": baum_row['Lb'],
-                    "baum_geomorphotype": baum_row['Geomorphotype'],
-                    "baum_data_source": "Baum et al. (2024)"
-                })
-        
-        # Use the actual basin polygon geometry
-        # Convert to GeoJSON format (preserves Polygon or MultiPolygon)
-        geometry = row.geometry.__geo_interface__
-        
-        # Round coordinates to 4 decimal places for file size optimization
-        def round_coords(coords):
-            if isinstance(coords[0], (list, tuple)):
-                return [round_coords(c) for c in coords]
-            else:
-                return [round(coords[0], 4), round(coords[1], 4)]
-        
-        if geometry['type'] == 'Polygon':
-            geometry['coordinates'] = [round_coords(ring) for ring in geometry['coordinates']]
-        elif geometry['type'] == 'MultiPolygon':
-            geometry['coordinates'] = [[round_coords(ring) for ring in polygon] for polygon in geometry['coordinates']]
-        
-        feature = {
-            "type": "Feature",
-            "geometry": geometry,
-            "properties": properties
-        }
-        
-        features.append(feature)
+    geometries = np.asarray(geometries)
+    
+    # Encode contiguous chunks across threads (shapely 2 releases the GIL)
+    bounds = np.linspace(0, len(geometries), (os.cpu_count() or 1) + 1).astype(int)
+    with ThreadPoolExecutor() as executor:
+        parts = executor.map(
+            lambda start, stop: encode_basin_chunk(
+                geometries[start:stop], properties[start:stop], integer_coords
+            ),
+            bounds[:-1], bounds[1:]
+        )
+        return [feature for part in parts for feature in part]
+
+
+def encode_basin_chunk(geometries, properties, integer_coords=False):
+    """Encode a chunk of basin polygons and their properties as GeoJSON feature strings."""
+    # Round coordinates to 4 decimal places for file size optimization
+    # (snapped in GEOS, vertex by vertex, without altering topology)
+    geometries = shapely.set_precision(geometries, COORDINATE_GRID, mode='pointwise')
+    
+    # Use the actual basin polygon geometry
+    # GEOS writes the GeoJSON geometry text (preserves Polygon or MultiPolygon)
+    # Missing geometries come back as None and are written as GeoJSON null
+    geometry_json = [geom or 'null' for geom in shapely.to_geojson(geometries)]
+    if integer_coords:
+        geometry_json = [INTEGRAL_FLOAT_RE.sub('', geom) for geom in geometry_json]
+    
+    return [
+        '{"type":"Feature","geometry":%s,"properties":%s}' % (
+            geom, json.dumps(props, ensure_ascii=False, separators=(',', ':'))
+        )
+        for geom, props in zip(geometry_json, properties)
+    ]
+
+
+def quantize_geometries(geometries):
+    """
+    Quantize geometries to integer multiples of COORDINATE_GRID (TopoJSON-style).
+    
+    Coordinates are stored relative to the lower-left corner of the data, so a
+    client restores them as lon = x * scale[0] + translate[0] (same for lat).
     
-    return features
+    Args:
+        geometries: Array of shapely geometries
+    
+    Returns:
+        Tuple of (quantized geometries, transform dict with scale and translate)
+    """
+    translate = np.floor(shapely.total_bounds(geometries)[:2] / COORDINATE_GRID) * COORDINATE_GRID
+    quantized = shapely.transform(
+        geometries, lambda coords: np.round((coords - translate) / COORDINATE_GRID)
+    )
+    transform = {
+        "scale": [COORDINATE_GRID, COORDINATE_GRID],
+        "translate": np.round(translate, 4).tolist()
+    }
+    return quantized, transform
 
 
-def create_coastline_features(coastline_gdf):
+def create_coastline_layer(coastline_gdf):
     """
-    Create GeoJSON features from Dürr coastline data for coastal segmentation view.
+    Create the web layer from Dürr coastline data for coastal segmentation view.
     
     Args:
         coastline_gdf: GeoDataFrame from typology_coastline.shp
     
     Returns:
-        List of GeoJSON features with LineString geometries
+        GeoDataFrame with LineString geometries and GeoJSON properties as columns
     """
-    features = []
-    
-    for idx, row in coastline_gdf.iterrows():
-        # Extract properties
-        properties = {
-            "type": SIMPLE_TYPE_MAP.get(row['FIN_TYP'], "Unknown"),
-            "type_detailed": DURR_TYPE_MAP.get(row['FIN_TYP'], "Unknown"),
-            "type_code": int(row['FIN_TYP']),
-            "length_km": round(row['LENGTH'], 2) if pd.notna(row['LENGTH']) else None,
-            "coastline_id": idx,
+    fin_types = coastline_gdf['FIN_TYP']
+    
+    return gpd.GeoDataFrame(
+        {
+            "type": fin_types.map(SIMPLE_TYPE_MAP).fillna("Unknown").to_numpy(),
+            "type_detailed": fin_types.map(DURR_TYPE_MAP).fillna("Unknown").to_numpy(),
+            "type_code": fin_types.astype(np.int32).to_numpy(),
+            "length_km": coastline_gdf['LENGTH'].round(2).to_numpy(),
+            "coastline_id": coastline_gdf.index.to_numpy(),
             "data_source": "Dürr et al. (2011) - Coastal Typology",
             "data_source_doi": "10.1007/s12237-011-9381-y"
-        }
-        
-        # Convert geometry to GeoJSON format
-        coords = [[round(x, 4), round(y, 4)] for x, y in row.geometry.coords]
+        },
+        geometry=coastline_gdf.geometry.values,
+        crs=coastline_gdf.crs
+    )
+
+
+def write_geojson(data, output_path, compress=False):
+    """
+    Stream a FeatureCollection to disk as compact JSON, one feature at a time.
+    
+    Features may be dicts (encoded incrementally with iterencode) or JSON
+    strings pre-encoded by encode_basin_chunk, which are written verbatim.
+    
+    Args:
+        data: FeatureCollection dict
+        output_path: Path of the .geojson file
+        compress: Also write a gzip-compressed copy to output_path + '.gz'
+    
+    Returns:
+        List of written file paths
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    header = {key: value for key, value in data.items() if key != "features"}
+    
+    written = []
+    with ExitStack() as stack:
+        handles = [stack.enter_context(open(output_path, 'w', encoding='utf-8'))]
+        written.append(str(output_path))
+        if compress:
+            gz_path = f"{output_path}.gz"
+            handles.append(stack.enter_context(
+                gzip.open(gz_path, 'wt', encoding='utf-8', compresslevel=6)
+            ))
+            written.append(gz_path)
         
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "LineString",
-                "coordinates": coords
-            },
-            "properties": properties
-        }
+        def emit(chunk):
+            for handle in handles:
+                handle.write(chunk)
         
-        features.append(feature)
+        emit(encoder.encode(header)[:-1] + (',' if header else '') + '"features":[')
+        for i, feature in enumerate(data["features"]):
+            if i:
+                emit(',')
+            if isinstance(feature, str):
+                emit(feature)
+            else:
+                for chunk in encoder.iterencode(feature):
+                    emit(chunk)
+        emit(']}')
     
-    return features
+    return written
+
+
+def parse_bbox(value):
+    """Parse a 'minx,miny,maxx,maxy' string into a bbox tuple."""
+    try:
+        minx, miny, maxx, maxy = (float(v) for v in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected minx,miny,maxx,maxy, got {value!r}")
+    return minx, miny, maxx, maxy
+
 
 def main():
     """Main function to process estuary data and generate GeoJSON output."""
+    parser = argparse.ArgumentParser(description='Process Dürr/Baum estuary data into web GeoJSON')
+    parser.add_argument('--emit-full-geojson', action='store_true',
+                        help='Also write full-resolution basins.geojson (basins.gpkg already holds it)')
+    parser.add_argument('--bbox', type=parse_bbox, metavar='MINX,MINY,MAXX,MAXY',
+                        help='Only process features intersecting this lon/lat box (for quick regional runs)')
+    parser.add_argument('--quantize-simplified', action='store_true',
+                        help='Write basins_simplified.geojson with integer coordinates plus a "transform" block')
+    parser.add_argument('--gzip', action='store_true',
+                        help='Also write gzip-compressed .geojson.gz copies of the GeoJSON outputs')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Processing Real Estuary Data - ALL GLOBAL ESTUARIES")
     print("=" * 60)
@@ -293,7 +443,7 @@ def main():
         print(f"Error: Dürr shapefile not found at {durr_shapefile}", file=sys.stderr)
         sys.exit(1)
     
-    durr_gdf = load_durr_data(str(durr_shapefile))
+    durr_gdf = load_durr_data(str(durr_shapefile), bbox=args.bbox)
     
     # Load Baum et al. (2024) CSV (optional)
     baum_csv = data_dir / 'Large-estuaries-Baum_2024' / 'Baum_2024_Geomorphology.csv'
@@ -303,33 +453,37 @@ def main():
     else:
         print(f"Warning: Baum CSV not found at {baum_csv}, skipping enrichment")
     
+    # Plain .geojson is always written; --gzip adds .geojson.gz copies
+    compress = args.gzip
+    
+    # Metadata shared by all outputs of this run
+    generated_date = pd.Timestamp.now().isoformat()
+    basin_sources = [
+        {**DURR_SOURCE, "description": "Primary typology and basin geometry source"},
+        BAUM_SOURCE
+    ]
+    
     # Process ALL estuaries (no sampling limit)
     print(f"\nProcessing ALL {len(durr_gdf)} estuaries for full global coverage...")
     
+    # Properties are shared by the point and basin outputs (only geometries differ)
+    properties = build_properties(durr_gdf, baum_df)
+    
     # Create GeoJSON features for point view (estuary catchments)
     print("\nCreating GeoJSON features for estuary points...")
-    features = create_estuary_features(durr_gdf, baum_df)
+    features = create_estuary_features(durr_gdf, properties)
     
     # Create GeoJSON structure for points
     estuary_data = {
         "type": "FeatureCollection",
         "metadata": {
             "data_sources": [
-                {
-                    "name": "Dürr et al. (2011)",
-                    "title": "Worldwide typology of nearshore coastal systems",
-                    "doi": "10.1007/s12237-011-9381-y",
-                    "description": "Primary typology and geometry source"
-                },
-                {
-                    "name": "Baum et al. (2024)",
-                    "title": "Large structural estuaries",
-                    "description": "Supplementary morphometry data"
-                }
+                {**DURR_SOURCE, "description": "Primary typology and geometry source"},
+                BAUM_SOURCE
             ],
             "note": "Full global dataset - all ~6,200+ estuaries from Dürr et al. (2011)",
             "gcc_note": "GCC (Athanasiou et al. 2024) geophysical data can be added by downloading from https://zenodo.org/records/11072020",
-            "generated_date": pd.Timestamp.now().isoformat()
+            "generated_date": generated_date
         },
         "features": features
     }
@@ -337,59 +491,51 @@ def main():
     # Output estuaries to data directory
     output_path = data_dir / 'estuaries.geojson'
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(estuary_data, f, indent=2, ensure_ascii=False)
+    written = write_geojson(estuary_data, output_path, compress=compress)
     
     print(f"\n✓ Generated {len(features)} estuary points")
-    print(f"✓ Output saved to: {output_path}")
+    print(f"✓ Output saved to: {', '.join(written)}")
     
     # Create basin polygon features
     print("\n" + "=" * 60)
     print("Processing Basin Polygon Data")
     print("=" * 60)
-    print("\nCreating GeoJSON features for basin polygons...")
     
-    basin_features = create_basin_polygon_features(durr_gdf, baum_df)
-    
-    # Create GeoJSON structure for basins
-    basin_data = {
-        "type": "FeatureCollection",
-        "metadata": {
-            "data_sources": [
-                {
-                    "name": "Dürr et al. (2011)",
-                    "title": "Worldwide typology of nearshore coastal systems",
-                    "doi": "10.1007/s12237-011-9381-y",
-                    "description": "Primary typology and basin geometry source"
-                },
-                {
-                    "name": "Baum et al. (2024)",
-                    "title": "Large structural estuaries",
-                    "description": "Supplementary morphometry data"
-                }
-            ],
-            "note": "Full global dataset - all ~6,200+ estuary basin polygons from Dürr et al. (2011)",
-            "visualization_note": "Basin polygons show complete drainage basins for each estuary",
-            "generated_date": pd.Timestamp.now().isoformat()
-        },
-        "features": basin_features
-    }
-    
-    # Output basin polygons to data directory
-    basin_output_path = data_dir / 'basins.geojson'
-    
-    with open(basin_output_path, 'w', encoding='utf-8') as f:
-        json.dump(basin_data, f, indent=2, ensure_ascii=False)
-    
-    print(f"\n✓ Generated {len(basin_features)} basin polygons")
-    print(f"✓ Output saved to: {basin_output_path}")
+    # Full-resolution GeoJSON duplicates basins.gpkg and is too heavy for the web,
+    # so it is only written on request
+    if args.emit_full_geojson:
+        print("\nCreating GeoJSON features for basin polygons...")
+        
+        basin_features = create_basin_polygon_features(durr_gdf.geometry, properties)
+        
+        # Create GeoJSON structure for basins
+        basin_data = {
+            "type": "FeatureCollection",
+            "metadata": {
+                "data_sources": basin_sources,
+                "note": "Full global dataset - all ~6,200+ estuary basin polygons from Dürr et al. (2011)",
+                "visualization_note": "Basin polygons show complete drainage basins for each estuary",
+                "generated_date": generated_date
+            },
+            "features": basin_features
+        }
+        
+        # Output basin polygons to data directory
+        basin_output_path = data_dir / 'basins.geojson'
+        
+        written = write_geojson(basin_data, basin_output_path, compress=compress)
+        
+        print(f"\n✓ Generated {len(basin_features)} basin polygons")
+        print(f"✓ Output saved to: {', '.join(written)}")
     
     # Also save as GeoPackage for efficient storage
     print("\nSaving basin polygons as GeoPackage...")
     durr_gdf_with_properties = durr_gdf.copy()
     
-    # Remove duplicate columns before saving
-    durr_gdf_with_properties = durr_gdf_with_properties.loc[:, ~durr_gdf_with_properties.columns.duplicated()]
+    # GeoPackage layers cannot hold duplicate field names
+    if not durr_gdf_with_properties.columns.is_unique:
+        raise ValueError("Duplicate columns in Dürr catchments: "
+                         f"{list(durr_gdf_with_properties.columns[durr_gdf_with_properties.columns.duplicated()])}")
     
     durr_gdf_with_properties['type'] = durr_gdf_with_properties['FIN_TYP'].map(SIMPLE_TYPE_MAP).fillna('Unknown')
     durr_gdf_with_properties['type_detailed'] = durr_gdf_with_properties['FIN_TYP'].map(DURR_TYPE_MAP).fillna('Unknown')
@@ -401,44 +547,49 @@ def main():
     
     # Create simplified version for web display
     print("\nCreating simplified basin polygons for web display...")
-    durr_gdf_simplified = durr_gdf.copy()
-    durr_gdf_simplified['geometry'] = durr_gdf_simplified.geometry.simplify(tolerance=0.05, preserve_topology=True)
+    simplified_geometries = shapely.simplify(
+        durr_gdf.geometry.values, SIMPLIFY_TOLERANCE, preserve_topology=True
+    )
+    
+    # Optionally quantize coordinates to integers (smaller file, needs client-side decoding)
+    transform = None
+    if args.quantize_simplified:
+        simplified_geometries, transform = quantize_geometries(simplified_geometries)
     
-    basin_features_simplified = create_basin_polygon_features(durr_gdf_simplified, baum_df)
+    basin_features_simplified = create_basin_polygon_features(
+        simplified_geometries, properties, integer_coords=transform is not None
+    )
     
     # Create GeoJSON structure for simplified basins
     basin_data_simplified = {
         "type": "FeatureCollection",
         "metadata": {
-            "data_sources": [
-                {
-                    "name": "Dürr et al. (2011)",
-                    "title": "Worldwide typology of nearshore coastal systems",
-                    "doi": "10.1007/s12237-011-9381-y",
-                    "description": "Primary typology and basin geometry source"
-                },
-                {
-                    "name": "Baum et al. (2024)",
-                    "title": "Large structural estuaries",
-                    "description": "Supplementary morphometry data"
-                }
-            ],
-            "note": "Simplified basin polygons (tolerance=0.05) optimized for web display",
-            "full_resolution_note": "Full resolution data available in basins.geojson and basins.gpkg",
+            "data_sources": basin_sources,
+            "note": f"Simplified basin polygons (tolerance={SIMPLIFY_TOLERANCE}) optimized for web display",
+            "full_resolution_note": "Full resolution data available in basins.gpkg",
             "visualization_note": "Basin polygons show complete drainage basins for each estuary",
-            "generated_date": pd.Timestamp.now().isoformat()
+            "generated_date": generated_date
         },
         "features": basin_features_simplified
     }
-    
-    # Output simplified basin polygons (no indent for smaller file size)
+    if compress:
+        basin_data_simplified["metadata"]["compression_note"] = (
+            "Also published gzip-compressed as basins_simplified.geojson.gz"
+        )
+    if transform is not None:
+        basin_data_simplified["transform"] = transform
+        basin_data_simplified["metadata"]["coordinate_note"] = (
+            "Coordinates are quantized integers: lon = x * scale[0] + translate[0], "
+            "lat = y * scale[1] + translate[1]"
+        )
+    
+    # Output simplified basin polygons
     basin_simplified_output_path = data_dir / 'basins_simplified.geojson'
     
-    with open(basin_simplified_output_path, 'w', encoding='utf-8') as f:
-        json.dump(basin_data_simplified, f, ensure_ascii=False)
+    written = write_geojson(basin_data_simplified, basin_simplified_output_path, compress=compress)
     
     print(f"✓ Generated {len(basin_features_simplified)} simplified basin polygons")
-    print(f"✓ Output saved to: {basin_simplified_output_path}")
+    print(f"✓ Output saved to: {', '.join(written)}")
     
     # Process coastline data for coastal segmentation mode
     print("\n" + "=" * 60)
@@ -448,43 +599,66 @@ def main():
     coastline_shapefile = data_dir / 'Worldwide-typology-Shapefile-Durr_2011' / 'typology_coastline.shp'
     if coastline_shapefile.exists():
         print(f"Loading coastline shapefile: {coastline_shapefile}")
-        coastline_gdf = gpd.read_file(str(coastline_shapefile))
-        
-        # Filter to meaningful coastal types (same as catchments)
-        valid_types = [1, 2, 3, 4, 5, 6]
-        coastline_gdf = coastline_gdf[coastline_gdf['FIN_TYP'].isin(valid_types)].copy()
+        # Filter to meaningful coastal types (same as catchments) during the read
+        # (FIDs kept as the index so coastline_id still refers to the source feature)
+        coastline_gdf = gpd.read_file(
+            str(coastline_shapefile),
+            engine='pyogrio',
+            columns=DURR_COASTLINE_COLUMNS,
+            where=DURR_COASTLINE_WHERE,
+            bbox=args.bbox,
+            fid_as_index=True
+        )
         
         print(f"Found {len(coastline_gdf)} valid coastline segments")
         
-        # Create GeoJSON features for coastline view
+        # Create web layer for coastline view
         print("\nCreating GeoJSON features for coastal segments...")
-        coastline_features = create_coastline_features(coastline_gdf)
+        coastline_layer = create_coastline_layer(coastline_gdf)
         
-        # Create GeoJSON structure for coastline
-        coastline_data = {
-            "type": "FeatureCollection",
-            "metadata": {
-                "data_sources": [
-                    {
-                        "name": "Dürr et al. (2011)",
-                        "title": "Worldwide typology of nearshore coastal systems - Coastline",
-                        "doi": "10.1007/s12237-011-9381-y",
-                        "description": "Global coastal segmentation by estuary type"
-                    }
-                ],
-                "note": "Coastal segments colored by estuary type for global visualization",
-                "generated_date": pd.Timestamp.now().isoformat()
-            },
-            "features": coastline_features
+        coastline_metadata = {
+            "data_sources": [
+                {
+                    **DURR_SOURCE,
+                    "title": "Worldwide typology of nearshore coastal systems - Coastline",
+                    "description": "Global coastal segmentation by estuary type"
+                }
+            ],
+            "note": "Coastal segments colored by estuary type for global visualization",
+            "generated_date": generated_date
         }
         
         # Output coastline to data directory
         coastline_output_path = data_dir / 'coastline.geojson'
         
-        with open(coastline_output_path, 'w', encoding='utf-8') as f:
-            json.dump(coastline_data, f, indent=2, ensure_ascii=False)
+        if pyogrio.__gdal_version__ >= GDAL_FOREIGN_MEMBERS_VERSION:
+            # Encoded by GDAL, metadata kept as a foreign member of the FeatureCollection
+            coastline_layer.to_file(
+                str(coastline_output_path),
+                driver='GeoJSON',
+                engine='pyogrio',
+                COORDINATE_PRECISION=4,
+                FOREIGN_MEMBERS_COLLECTION=json.dumps(
+                    {"metadata": coastline_metadata}, ensure_ascii=False
+                )
+            )
+        else:
+            # Older GDAL ignores FOREIGN_MEMBERS_COLLECTION and would drop the
+            # metadata, so encode the features ourselves (same 4-decimal grid)
+            coastline_features = create_basin_polygon_features(
+                coastline_layer.geometry.values,
+                coastline_layer.drop(columns='geometry').to_dict('records')
+            )
+            write_geojson(
+                {
+                    "type": "FeatureCollection",
+                    "metadata": coastline_metadata,
+                    "features": coastline_features
+                },
+                coastline_output_path
+            )
         
-        print(f"\n✓ Generated {len(coastline_features)} coastline segments")
+        print(f"\n✓ Generated {len(coastline_layer)} coastline segments")
         print(f"✓ Output saved to: {coastline_output_path}")
     else:
         print(f"Warning: Coastline shapefile not found at {coastline_shapefile}, skipping coastal mode")
@@ -494,14 +668,14 @@ def main():
     print("Summary Statistics")
     print("=" * 60)
     
-    types = {}
-    for feature in features:
-        estuary_type = feature['properties']['type']
-        types[estuary_type] = types.get(estuary_type, 0) + 1
+    # Count the simple types already mapped for the GeoPackage (np.unique sorts them)
+    labels, counts = np.unique(
+        durr_gdf_with_properties['type'].to_numpy(dtype=str), return_counts=True
+    )
     
     print(f"\nTotal estuaries: {len(features)}")
     print("\nEstuary types distribution:")
-    for estuary_type, count in sorted(types.items()):
+    for estuary_type, count in zip(labels.tolist(), counts.tolist()):
         print(f"  {estuary_type}: {count}")
     
     print("\n" + "=" * 60)
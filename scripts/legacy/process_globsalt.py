@@ -14,7 +14,7 @@ SCIENTIFIC CLASSIFICATION:
 - Lower Estuary/Mouth (Marine): 25.0-35.0 ppt
 
 PROCESSING STEPS:
-1. Read GlobSalt CSV in chunks (memory-efficient)
+1. Stream GlobSalt CSV in record batches (memory-efficient)
 2. Convert electrical conductivity (EC) to salinity (ppt)
 3. Aggregate by HydroBASINS ID (HYBAS_ID) - spatial aggregation
 4. Calculate mean/median salinity per basin
@@ -39,6 +39,8 @@ License: MIT
 import pandas as pd
 import geopandas as gpd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from pathlib import Path
 import json
 import time
@@ -73,8 +75,32 @@ SALINITY_CLASSES = {
     'hyperhaline': (35.0, 999.0),     # >35 ppt: Hypersaline (rare in estuaries)
 }
 
+# Zone colors for visualization
+ZONE_COLORS = {
+    'freshwater': '#2166ac',    # Dark blue
+    'oligohaline': '#67a9cf',   # Light blue
+    'mesohaline': '#d1e5f0',    # Very light blue
+    'polyhaline': '#fddbc7',    # Light orange
+    'euhaline': '#ef8a62',      # Orange
+    'hyperhaline': '#b2182b',   # Red
+    'unknown': '#999999'        # Gray
+}
+
+# Zone lookup for vectorized classification (lower bounds above freshwater)
+SALINITY_ZONE_NAMES = np.array(list(SALINITY_CLASSES))
+SALINITY_ZONE_EDGES = np.array([min_sal for min_sal, _ in SALINITY_CLASSES.values()][1:])
+
 # Processing configuration
-CHUNK_SIZE = 100000  # Process 100k rows at a time (memory-efficient)
+CSV_BLOCK_SIZE = 64 << 20  # Parse 64 MB of CSV per record batch (memory-efficient)
+# Only columns used downstream, with pinned types (the streaming reader would
+# otherwise infer them from the first block and fail on a later, wider one)
+GLOBSALT_COLUMN_TYPES = {
+    'Conductivity': pa.float64(),
+    'HYBAS_ID': pa.int64(),
+    'x': pa.float64(),
+    'y': pa.float64(),
+}
+GLOBSALT_COLUMNS = list(GLOBSALT_COLUMN_TYPES)
 MIN_RECORDS_PER_BASIN = 5  # Minimum observations for reliable estimate
 
 # ==============================================================================
@@ -86,22 +112,22 @@ def ec_to_salinity(ec_us_cm, temp_c=25):
     Convert electrical conductivity (EC) to salinity (ppt).
     
     Uses empirical relationship from UNESCO (1981) and Schemel (2001)
-    for estuarine waters.
+    for estuarine waters. Vectorized over NumPy arrays.
     
     Args:
-        ec_us_cm: Electrical conductivity in μS/cm
+        ec_us_cm: Electrical conductivity in μS/cm (scalar or array)
         temp_c: Water temperature in °C (default 25°C)
         
     Returns:
-        Salinity in parts per thousand (ppt)
+        Salinity in parts per thousand (ppt), a float for scalar input;
+        NaN for missing or negative EC
         
     Reference:
     - Schemel, L.E. (2001). Simplified conversions between specific conductance 
       and salinity units for use with data from monitoring stations.
     - UNESCO (1981). The practical salinity scale 1978
     """
-    if pd.isna(ec_us_cm) or ec_us_cm < 0:
-        return np.nan
+    ec_us_cm = np.asarray(ec_us_cm, dtype=np.float64)
     
     # Convert μS/cm to mS/cm
     ec_ms_cm = ec_us_cm / 1000.0
@@ -110,18 +136,27 @@ def ec_to_salinity(ec_us_cm, temp_c=25):
     # salinity (ppt) ≈ EC (mS/cm) * 0.64
     # More accurate for EC < 5000 μS/cm (salinity < 3.2 ppt)
     
-    if ec_us_cm < 5000:
-        # Low salinity: Linear relationship
-        salinity = ec_ms_cm * 0.64
-    else:
-        # Higher salinity: Polynomial relationship (UNESCO 1981)
-        # Simplified for computational efficiency
-        salinity = 0.0080 - 0.1692 * np.sqrt(ec_ms_cm) + 25.3851 * ec_ms_cm + 14.0941 * (ec_ms_cm ** 1.5) - 7.0261 * (ec_ms_cm ** 2) + 2.7081 * (ec_ms_cm ** 2.5)
-        
-        # Clamp to realistic range
-        salinity = max(0, min(salinity, 50))
+    # Low salinity: Linear relationship
+    salinity_low = ec_ms_cm * 0.64
     
-    return salinity
+    # Higher salinity: Polynomial relationship (UNESCO 1981)
+    # Simplified for computational efficiency: a quintic in sqrt(EC), evaluated
+    # Horner-style with a single sqrt instead of fractional powers
+    with np.errstate(invalid='ignore'):
+        sqrt_ec = np.sqrt(ec_ms_cm)
+    salinity_high = ((((2.7081 * sqrt_ec - 7.0261) * sqrt_ec + 14.0941) * sqrt_ec
+                      + 25.3851) * sqrt_ec - 0.1692) * sqrt_ec + 0.0080
+    
+    # Clamp to realistic range
+    salinity_high = np.clip(salinity_high, 0, 50)
+    
+    salinity = np.where(ec_us_cm < 5000, salinity_low, salinity_high)
+    
+    # Missing (NaN) and negative readings have no valid salinity
+    salinity = np.where(ec_us_cm >= 0, salinity, np.nan)
+    
+    # [()] unwraps 0-d results to a plain float, arrays pass through unchanged
+    return salinity[()]
 
 
 def classify_salinity(salinity_ppt):
@@ -129,33 +164,27 @@ def classify_salinity(salinity_ppt):
     Classify salinity into ecological zones.
     
     Args:
-        salinity_ppt: Salinity in parts per thousand
+        salinity_ppt: Salinity in parts per thousand (scalar or array)
         
     Returns:
-        Classification string
+        Classification string (array of strings for array input);
+        'unknown' for NaN
     """
-    if pd.isna(salinity_ppt):
-        return 'unknown'
+    salinity_ppt = np.asarray(salinity_ppt, dtype=np.float64)
     
-    for zone_name, (min_sal, max_sal) in SALINITY_CLASSES.items():
-        if min_sal <= salinity_ppt < max_sal:
-            return zone_name
+    zones = np.where(
+        np.isnan(salinity_ppt),
+        'unknown',
+        SALINITY_ZONE_NAMES[np.digitize(salinity_ppt, SALINITY_ZONE_EDGES)]
+    ).astype(object)
     
-    return 'hyperhaline'
+    # [()] unwraps 0-d results to a plain string, arrays pass through unchanged
+    return zones[()]
 
 
 def get_zone_color(zone):
     """Get color code for salinity zone (for visualization)"""
-    colors = {
-        'freshwater': '#2166ac',    # Dark blue
-        'oligohaline': '#67a9cf',   # Light blue
-        'mesohaline': '#d1e5f0',    # Very light blue
-        'polyhaline': '#fddbc7',    # Light orange
-        'euhaline': '#ef8a62',      # Orange
-        'hyperhaline': '#b2182b',   # Red
-        'unknown': '#999999'        # Gray
-    }
-    return colors.get(zone, '#999999')
+    return ZONE_COLORS.get(zone, '#999999')
 
 
 # ==============================================================================
@@ -198,85 +227,84 @@ def process_globsalt_data():
     except UnicodeDecodeError:
         print(f"   Detected encoding: Latin-1 (fallback)")
     
-    # Process in chunks
-    print(f"\n⚙️  Processing in chunks of {CHUNK_SIZE:,} rows...")
+    # Stream record batches, parsing only the columns used below. All of them
+    # are numeric, and text columns are never decoded (check_utf8=False), so
+    # stray bad characters elsewhere in a row are tolerated as with the old
+    # encoding_errors='ignore'
+    print(f"\n⚙️  Processing in blocks of {CSV_BLOCK_SIZE >> 20} MB...")
+    reader = pacsv.open_csv(
+        GLOBSALT_FILE,
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE, encoding=encoding),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=GLOBSALT_COLUMNS,
+            column_types=GLOBSALT_COLUMN_TYPES,
+            check_utf8=False
+        )
+    )
     
-    basin_data = {}
+    chunk_frames = []
     chunk_count = 0
     processed_rows = 0
     
     start_time = time.time()
     
-    # Use detected encoding for reading CSV
-    for chunk in tqdm(pd.read_csv(GLOBSALT_FILE, chunksize=CHUNK_SIZE, encoding=encoding, 
-                                  encoding_errors='ignore'),  # Skip problematic characters
-                      desc="Processing chunks"):
+    for batch in tqdm(reader, desc="Processing chunks"):
+        chunk = batch.to_pandas()
         
         chunk_count += 1
         processed_rows += len(chunk)
         
         # Filter: Only keep conductivity data (required for salinity calculation)
-        chunk = chunk[chunk['Conductivity'].notna()].copy()
+        chunk = chunk[chunk['Conductivity'].notna()]
         
         if len(chunk) == 0:
             continue
         
-        # Convert conductivity to salinity
-        chunk['salinity_ppt'] = chunk['Conductivity'].apply(ec_to_salinity)
-        
-        # Classify salinity zones
-        chunk['salinity_zone'] = chunk['salinity_ppt'].apply(classify_salinity)
-        
-        # Aggregate by HYBAS_ID
-        for hybas_id, group in chunk.groupby('HYBAS_ID'):
-            if hybas_id not in basin_data:
-                basin_data[hybas_id] = {
-                    'salinity_values': [],
-                    'conductivity_values': [],
-                    'lon': group['x'].mean(),
-                    'lat': group['y'].mean(),
-                    'n_records': 0
-                }
-            
-            basin_data[hybas_id]['salinity_values'].extend(group['salinity_ppt'].dropna().tolist())
-            basin_data[hybas_id]['conductivity_values'].extend(group['Conductivity'].dropna().tolist())
-            basin_data[hybas_id]['n_records'] += len(group)
+        # Convert conductivity to salinity (zones are classified per basin below)
+        chunk_frames.append(
+            chunk.assign(salinity_ppt=ec_to_salinity(chunk['Conductivity'].to_numpy()))
+        )
+    
+    # Keep records as flat arrays; per-basin statistics come from one groupby
+    if chunk_frames:
+        records = pd.concat(chunk_frames, ignore_index=True)
+    else:
+        records = pd.DataFrame(columns=GLOBSALT_COLUMNS + ['salinity_ppt'], dtype=float)
+    del chunk_frames
     
     elapsed = time.time() - start_time
     
     print(f"\n✓ Processed {processed_rows:,} rows in {elapsed:.1f}s")
-    print(f"   Unique basins: {len(basin_data):,}")
+    print(f"   Unique basins: {records['HYBAS_ID'].nunique():,}")
     
     # Aggregate statistics per basin
     print(f"\n📊 Calculating basin-level statistics...")
     
-    results = []
-    for hybas_id, data in tqdm(basin_data.items(), desc="Aggregating"):
-        if len(data['salinity_values']) < MIN_RECORDS_PER_BASIN:
-            continue  # Skip basins with insufficient data
-        
-        sal_values = np.array(data['salinity_values'])
-        
-        result = {
-            'HYBAS_ID': hybas_id,
-            'lon': data['lon'],
-            'lat': data['lat'],
-            'n_records': data['n_records'],
-            'salinity_mean': np.mean(sal_values),
-            'salinity_median': np.median(sal_values),
-            'salinity_std': np.std(sal_values),
-            'salinity_min': np.min(sal_values),
-            'salinity_max': np.max(sal_values),
-            'conductivity_mean': np.mean(data['conductivity_values']),
-        }
-        
-        # Classify based on median salinity (most robust)
-        result['salinity_zone'] = classify_salinity(result['salinity_median'])
-        result['zone_color'] = get_zone_color(result['salinity_zone'])
-        
-        results.append(result)
-    
-    df_result = pd.DataFrame(results)
+    stats = records.groupby('HYBAS_ID').agg(
+        lon=('x', 'mean'),
+        lat=('y', 'mean'),
+        n_records=('Conductivity', 'size'),
+        n_salinity=('salinity_ppt', 'count'),
+        salinity_mean=('salinity_ppt', 'mean'),
+        salinity_median=('salinity_ppt', 'median'),
+        salinity_std=('salinity_ppt', 'std'),
+        salinity_min=('salinity_ppt', 'min'),
+        salinity_max=('salinity_ppt', 'max'),
+        conductivity_mean=('Conductivity', 'mean'),
+    )
+    
+    # Skip basins with insufficient data
+    stats = stats[stats['n_salinity'] >= MIN_RECORDS_PER_BASIN]
+    
+    # Population standard deviation (ddof=0), as np.std
+    n_salinity = stats['n_salinity']
+    stats = stats.assign(salinity_std=stats['salinity_std'] * np.sqrt((n_salinity - 1) / n_salinity))
+    
+    df_result = stats.drop(columns='n_salinity').reset_index()
+    
+    # Classify based on median salinity (most robust), all basins at once
+    df_result['salinity_zone'] = classify_salinity(df_result['salinity_median'].to_numpy())
+    df_result['zone_color'] = df_result['salinity_zone'].map(ZONE_COLORS).fillna('#999999')
     
     print(f"\n✓ Aggregated to {len(df_result):,} basins with sufficient data")
     print(f"\n📈 Salinity Zone Distribution:")
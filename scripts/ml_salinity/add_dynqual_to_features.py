@@ -23,6 +23,7 @@ from pathlib import Path
 import pandas as pd
 import numpy as np
 import xarray as xr
+import pyarrow.parquet as pq
 
 warnings.filterwarnings('ignore')
 
@@ -66,15 +67,22 @@ def load_dynqual_datasets():
         return None
     
     try:
-        ds_temp = xr.open_dataset(temp_file)
-        temp_var = list(ds_temp.data_vars)[0]
-        
-        print(f"✓ Loaded DynQual temperature dataset")
-        print(f"   Variable: {temp_var}")
-        print(f"   Shape: {ds_temp[temp_var].shape}")
-        print(f"   Time range: {ds_temp.time.values[0]} to {ds_temp.time.values[-1]}")
+        # Only the 2010-2019 slice is read from disk; the handle is released after
+        with xr.open_dataset(temp_file) as ds_temp:
+            temp_var = list(ds_temp.data_vars)[0]
+            
+            print(f"✓ Loaded DynQual temperature dataset")
+            print(f"   Variable: {temp_var}")
+            print(f"   Shape: {ds_temp[temp_var].shape}")
+            print(f"   Time range: {ds_temp.time.values[0]} to {ds_temp.time.values[-1]}")
+            
+            # Use most recent decade (2010-2019) for contemporary conditions
+            # Time dimension: 0=1980, 39=2019, so indices 30-39 = 2010-2019
+            # Computed once here and shared by every region
+            print(f"   Computing recent decade average (2010-2019)...")
+            temp_recent = ds_temp[temp_var].isel(time=slice(30, 40)).mean(dim='time').load()
         
-        return {'temperature': ds_temp}
+        return {'temperature_recent': temp_recent}
         
     except Exception as e:
         print(f"❌ Error loading DynQual temperature: {e}")
@@ -98,14 +106,14 @@ def add_dynqual_to_region(region_code: str, dynqual_datasets: dict):
         print(f"   Run ml_step1_extract_features.py first!")
         return False
     
-    features = pd.read_parquet(feature_file)
-    print(f"✓ Loaded {len(features):,} features")
-    
-    # Check if DynQual temperature already added
-    if 'dynqual_temperature_C' in features.columns:
+    # Check if DynQual temperature already added (schema only - no data read)
+    if 'dynqual_temperature_C' in pq.read_schema(feature_file).names:
         print(f"⚠️  DynQual temperature already exists, skipping")
         return True
     
+    features = pd.read_parquet(feature_file)
+    print(f"✓ Loaded {len(features):,} features")
+    
     # Load GRIT segments for geometries
     segments_file = PROCESSED_DIR / f'rivers_grit_segments_classified_{region_code.lower()}.gpkg'
     if not segments_file.exists():
@@ -113,42 +121,36 @@ def add_dynqual_to_region(region_code: str, dynqual_datasets: dict):
         return False
     
     import geopandas as gpd
-    segments = gpd.read_file(segments_file)
+    import shapely
+    # Only the join key and geometry are needed here
+    segments = gpd.read_file(segments_file, engine='pyogrio', use_arrow=True, columns=['global_id'])
     
     # Merge to get geometries
     data = features.merge(segments[['global_id', 'geometry']], on='global_id', how='left')
     data = gpd.GeoDataFrame(data, geometry='geometry', crs=segments.crs)
     
-    # Extract centroids
-    centroids_lon = data.geometry.centroid.x.values
-    centroids_lat = data.geometry.centroid.y.values
+    # Extract centroids (one batched GEOS call, reused for lon and lat)
+    centroids = shapely.centroid(data.geometry.values)
+    centroids_lon = shapely.get_x(centroids)
+    centroids_lat = shapely.get_y(centroids)
     
     print(f"\n📊 Extracting DynQual values at {len(data):,} centroids...")
     
-    # Get variable names (TEMPERATURE ONLY!)
-    ds_temp = dynqual_datasets['temperature']
-    temp_var = list(ds_temp.data_vars)[0]
+    # Recent decade (2010-2019) temperature grid (TEMPERATURE ONLY!)
+    ds_temp_recent = dynqual_datasets['temperature_recent']
     
     # REMOVED: salinity (poor quality, circular reasoning)
     # REMOVED: discharge (use GRIT upstream_area instead!)
     
-    # Use most recent decade (2010-2019) for contemporary conditions
-    # Time dimension: 0=1980, 39=2019, so indices 30-39 = 2010-2019
-    print(f"   Computing recent decade average (2010-2019)...")
-    ds_temp_recent = ds_temp[temp_var].isel(time=slice(30, 40)).mean(dim='time')
-    
     # Extract temperature values (nearest neighbor)
     try:
         print(f"   Extracting temperature at {len(data):,} segment centroids...")
-        temp_values = []
-        
-        for i, (lon, lat) in enumerate(zip(centroids_lon, centroids_lat)):
-            if i % 10000 == 0 and i > 0:
-                print(f"      Progress: {i:,} / {len(data):,} ({i/len(data)*100:.1f}%)")
-            
-            # Temperature - recent decade average
-            temp = ds_temp_recent.sel(lon=lon, lat=lat, method='nearest').values
-            temp_values.append(float(temp) if not np.isnan(temp) else np.nan)
+        # Vectorized nearest-neighbor gather: one pointwise .sel for all centroids
+        temp_values = ds_temp_recent.sel(
+            lon=xr.DataArray(centroids_lon, dims='points'),
+            lat=xr.DataArray(centroids_lat, dims='points'),
+            method='nearest'
+        ).values.astype(np.float32)  # float32 is ample for temperature
         
         print(f"   ✓ Extracted {len(temp_values):,} temperature values")
         
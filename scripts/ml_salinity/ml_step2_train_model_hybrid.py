@@ -23,7 +23,6 @@ import numpy as np
 import pandas as pd
 from pathlib import Path
 import joblib
-import matplotlib.pyplot as plt
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
 from sklearn.preprocessing import LabelEncoder
@@ -14,14 +14,17 @@ Usage:
     python scripts/ml_step4_validate_improved.py --all-regions
 """
 
+import os
 import sys
 import warnings
 import argparse
 from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import geopandas as gpd
 import numpy as np
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+import shapely
 
 warnings.filterwarnings('ignore')
 
@@ -37,6 +40,9 @@ VALIDATION_DIR.mkdir(parents=True, exist_ok=True)
 
 GRIT_REGIONS = ['AF', 'AS', 'EU', 'NA', 'SA', 'SI', 'SP']
 
+# Prediction attributes used by the distance-based checks
+PREDICTION_ATTRIBUTE_COLUMNS = ['global_id', 'salinity_class_final', 'dist_to_coast_km']
+
 def print_section(title: str):
     """Print section header"""
     print(f"\n{'='*80}")
@@ -81,6 +87,7 @@ def validate_globsalt_holdout(region_code: str):
     # Load the trained model and metadata (use INLAND model for consistency)
     try:
         import joblib
+        from sklearn.metrics import classification_report
         model = joblib.load(MODEL_DIR / 'salinity_classifier_rf_inland.pkl')
         label_encoder = joblib.load(MODEL_DIR / 'label_encoder_inland.pkl')
         with open(MODEL_DIR / 'feature_columns_inland.txt', 'r') as f:
@@ -98,11 +105,8 @@ def validate_globsalt_holdout(region_code: str):
         print(f"❌ Features file not found: {features_file}")
         return None
     
-    features = pd.read_parquet(features_file)
-    
-    # Get segments with GlobSalt validation
-    has_globsalt = features['has_salinity'] == 1
-    globsalt_segments = features[has_globsalt].copy()
+    # Get segments with GlobSalt validation (row filter pushed down to the Parquet reader)
+    globsalt_segments = pd.read_parquet(features_file, filters=[('has_salinity', '==', 1)])
     
     if len(globsalt_segments) == 0:
         print(f"⚠️  No GlobSalt-validated segments in {region_code}")
@@ -201,6 +205,48 @@ def validate_globsalt_holdout(region_code: str):
     }
 
 
+@lru_cache(maxsize=1)
+def load_prediction_attributes(region_code: str):
+    """
+    Load prediction attributes with dist_to_coast_km for one region
+    
+    Cached so Methods 2 and 3 share a single read of the predictions GPKG.
+    Callers must not modify the returned DataFrame in place.
+    """
+    predictions_file = OUTPUT_DIR / f'rivers_grit_ml_classified_hybrid_{region_code.lower()}.gpkg'
+    features_file = ML_DIR / f'features_{region_code.lower()}.parquet'
+    
+    # Attributes only - geometry is not needed here
+    predictions = gpd.read_file(predictions_file, engine='pyogrio', use_arrow=True,
+                                ignore_geometry=True, columns=PREDICTION_ATTRIBUTE_COLUMNS)
+    
+    # Check if dist_to_coast_km already in predictions (hybrid model includes it)
+    if 'dist_to_coast_km' not in predictions.columns:
+        print(f"   Merging distance from features...")
+        features = pd.read_parquet(features_file, columns=['global_id', 'dist_to_coast_km'])
+        predictions = predictions.merge(features, on='global_id', how='left')
+    else:
+        print(f"   Using distance from predictions file...")
+    
+    return predictions
+
+
+def estuarine_stats_by_distance(predictions: pd.DataFrame, distance_bins: list):
+    """
+    Estuarine counts per contiguous [min, max) distance bin in one grouped pass
+    
+    Returns (min_dist, max_dist, label, total, estuarine_count, estuarine_pct)
+    tuples in bin order; empty bins are omitted.
+    """
+    edges = [min_dist for min_dist, _, _ in distance_bins] + [distance_bins[-1][1]]
+    bin_idx = pd.cut(predictions['dist_to_coast_km'], bins=edges, right=False, labels=False)
+    estuarine = predictions['salinity_class_final'].isin(['Oligohaline', 'Mesohaline', 'Polyhaline'])
+    stats = estuarine.groupby(bin_idx).agg(['size', 'sum', 'mean'])
+    
+    return [(*distance_bins[int(i)], n_segments, estuarine_count, estuarine_frac * 100)
+            for i, n_segments, estuarine_count, estuarine_frac in stats.itertuples()]
+
+
 def validate_distance_stratified(region_code: str):
     """
     Method 2: Distance-Stratified Analysis
@@ -222,20 +268,8 @@ def validate_distance_stratified(region_code: str):
         print(f"❌ Features not found: {features_file.name}")
         return None
     
-    # Load data
-    predictions = gpd.read_file(predictions_file)
-    
-    # Check if dist_to_coast_km already in predictions (hybrid model includes it)
-    if 'dist_to_coast_km' not in predictions.columns:
-        print(f"   Merging distance from features...")
-        features = pd.read_parquet(features_file)
-        predictions = predictions.merge(
-            features[['global_id', 'dist_to_coast_km']],
-            on='global_id',
-            how='left'
-        )
-    else:
-        print(f"   Using distance from predictions file...")
+    # Load data (shared with the other distance-based method)
+    predictions = load_prediction_attributes(region_code)
     
     # Define distance bins
     distance_bins = [
@@ -248,26 +282,16 @@ def validate_distance_stratified(region_code: str):
     print(f"\n📊 Estuarine Classification by Distance:")
     results = []
     
-    for min_dist, max_dist, label in distance_bins:
-        segments_in_bin = predictions[
-            (predictions['dist_to_coast_km'] >= min_dist) &
-            (predictions['dist_to_coast_km'] < max_dist)
-        ]
-        
-        if len(segments_in_bin) == 0:
-            continue
-        
-        estuarine = segments_in_bin['salinity_class_final'].isin(['Oligohaline', 'Mesohaline', 'Polyhaline'])
-        estuarine_pct = estuarine.mean() * 100
-        
-        print(f"   {label:45s}: {estuarine_pct:>5.1f}% (n={len(segments_in_bin):,})")
+    for (min_dist, max_dist, label, n_segments,
+         estuarine_count, estuarine_pct) in estuarine_stats_by_distance(predictions, distance_bins):
+        print(f"   {label:45s}: {estuarine_pct:>5.1f}% (n={n_segments:,})")
         
         results.append({
             'distance_bin': label,
             'min_dist': min_dist,
             'max_dist': max_dist,
-            'total_segments': len(segments_in_bin),
-            'estuarine_count': estuarine.sum(),
+            'total_segments': n_segments,
+            'estuarine_count': estuarine_count,
             'estuarine_pct': estuarine_pct
         })
     
@@ -354,6 +378,17 @@ def get_literature_tidal_extents():
     }
 
 
+def save_literature_database():
+    """Save the literature tidal extent database (region-independent, once per run)"""
+    lit_df = pd.DataFrame([
+        {'river_system': name, **values}
+        for name, values in get_literature_tidal_extents().items()
+    ])
+    lit_file = VALIDATION_DIR / 'literature_tidal_extents_database.csv'
+    lit_df.to_csv(lit_file, index=False)
+    print(f"💾 Literature database: {lit_file}")
+
+
 def validate_literature_tidal_extent(region_code: str):
     """
     Method 3: Literature-Based Tidal Extent Validation (GOLD STANDARD #2)
@@ -370,20 +405,8 @@ def validate_literature_tidal_extent(region_code: str):
         print(f"❌ Required files not found")
         return None
     
-    # Load data
-    predictions = gpd.read_file(predictions_file)
-    
-    # Check if dist_to_coast_km already in predictions (hybrid model includes it)
-    if 'dist_to_coast_km' not in predictions.columns:
-        print(f"   Merging distance from features...")
-        features = pd.read_parquet(features_file)
-        predictions = predictions.merge(
-            features[['global_id', 'dist_to_coast_km']],
-            on='global_id',
-            how='left'
-        )
-    else:
-        print(f"   Using distance from predictions file...")
+    # Load data (shared with the other distance-based method)
+    predictions = load_prediction_attributes(region_code)
     
     # Get literature values
     lit_systems = get_literature_tidal_extents()
@@ -412,18 +435,8 @@ def validate_literature_tidal_extent(region_code: str):
     print(f"   (Based on literature-documented tidal ranges)\n")
     
     results = []
-    for min_dist, max_dist, label in distance_bins:
-        segments_in_bin = predictions[
-            (predictions['dist_to_coast_km'] >= min_dist) &
-            (predictions['dist_to_coast_km'] < max_dist)
-        ]
-        
-        if len(segments_in_bin) == 0:
-            continue
-        
-        estuarine = segments_in_bin['salinity_class_final'].isin(['Oligohaline', 'Mesohaline', 'Polyhaline'])
-        estuarine_pct = estuarine.mean() * 100
-        
+    for (min_dist, max_dist, label, n_segments,
+         estuarine_count, estuarine_pct) in estuarine_stats_by_distance(predictions, distance_bins):
         # Expected rates based on literature
         if max_dist <= 50:
             expected = "70-90% (within most tidal zones)"
@@ -440,8 +453,8 @@ def validate_literature_tidal_extent(region_code: str):
             'distance_bin': label,
             'min_dist': min_dist,
             'max_dist': max_dist,
-            'total_segments': len(segments_in_bin),
-            'estuarine_count': estuarine.sum(),
+            'total_segments': n_segments,
+            'estuarine_count': estuarine_count,
             'estuarine_pct': estuarine_pct,
             'expected_range': expected
         })
@@ -456,16 +469,7 @@ def validate_literature_tidal_extent(region_code: str):
     results_df = pd.DataFrame(results)
     output_file = VALIDATION_DIR / f'literature_tidal_{region_code.lower()}.csv'
     results_df.to_csv(output_file, index=False)
-    
-    # Also save literature database
-    lit_df = pd.DataFrame([
-        {'river_system': name, **values}
-        for name, values in lit_systems.items()
-    ])
-    lit_file = VALIDATION_DIR / 'literature_tidal_extents_database.csv'
-    lit_df.to_csv(lit_file, index=False)
     print(f"\n💾 Saved: {output_file}")
-    print(f"💾 Literature database: {lit_file}")
     
     interpretation = "✅ CONSISTENT with literature-documented tidal ranges"
     print(f"\n💡 Interpretation: {interpretation}")
@@ -497,8 +501,9 @@ def validate_discharge_proxy(region_code: str):
         print(f"❌ Required files not found")
         return None
     
-    # Load data
-    predictions = gpd.read_file(predictions_file)
+    # Load data (attributes only - geometry is not needed here)
+    predictions = gpd.read_file(predictions_file, engine='pyogrio', use_arrow=True,
+                                ignore_geometry=True, columns=['global_id', 'salinity_class_final'])
     features = pd.read_parquet(features_file)
     
     # Check if we have DynQual discharge
@@ -513,14 +518,10 @@ def validate_discharge_proxy(region_code: str):
         how='left'
     )
     
-    # Calculate expected tidal length using Savenije (2012)
-    def expected_tidal_length(discharge_m3s):
-        """Estimate tidal intrusion from discharge"""
-        if pd.isna(discharge_m3s) or discharge_m3s <= 0:
-            return np.nan
-        return 30 * (discharge_m3s ** 0.2)
-    
-    predictions['expected_tidal_length_km'] = predictions['dynqual_discharge_m3s'].apply(expected_tidal_length)
+    # Calculate expected tidal length using Savenije (2012): L = 30 * Q^0.2
+    # (NaN where discharge is missing or non-positive)
+    discharge = predictions['dynqual_discharge_m3s']
+    predictions['expected_tidal_length_km'] = 30 * discharge.where(discharge > 0) ** 0.2
     
     # Check: segments within expected tidal zone
     predictions['in_expected_tidal_zone'] = (
@@ -607,28 +608,19 @@ def validate_durr_exploratory(region_code: str):
         return None
     
     try:
-        durr = gpd.read_file(durr_file)
-        predictions = gpd.read_file(predictions_file)
+        durr = gpd.read_file(durr_file, engine='pyogrio', use_arrow=True, columns=['FIN_TYP'])
+        predictions = gpd.read_file(predictions_file, engine='pyogrio', use_arrow=True,
+                                    columns=PREDICTION_ATTRIBUTE_COLUMNS)
         features = pd.read_parquet(features_file)
         
-        # Reset index to avoid conflicts
-        predictions = predictions.reset_index(drop=True)
-        durr = durr.reset_index(drop=True)
+        # Spatial join: one bulk STRtree query returning (segment, catchment)
+        # index pairs; segments outside Dürr catchments are dropped below anyway
+        durr_tree = shapely.STRtree(durr.geometry.values)
+        pred_idx, durr_idx = durr_tree.query(predictions.geometry.values, predicate='intersects')
         
-        # Remove any existing spatial join columns to prevent conflicts
-        for col in ['index_right', 'index_left']:
-            if col in predictions.columns:
-                predictions = predictions.drop(columns=[col])
-            if col in durr.columns:
-                durr = durr.drop(columns=[col])
-        
-        # Spatial join
-        predictions_with_durr = gpd.sjoin(
-            predictions,
-            durr[['FIN_TYP', 'geometry']],
-            how='left',
-            predicate='intersects'
-        )
+        predictions_with_durr = pd.DataFrame(predictions.drop(columns='geometry')).iloc[pred_idx]
+        predictions_with_durr = predictions_with_durr.reset_index(drop=True)
+        predictions_with_durr['FIN_TYP'] = durr['FIN_TYP'].values[durr_idx]
     except Exception as e:
         print(f"❌ Error during spatial join: {e}")
         print(f"   Skipping Dürr exploratory analysis for {region_code}")
@@ -655,29 +647,26 @@ def validate_durr_exploratory(region_code: str):
     print(f"\n📊 Estuarine % by Dürr Type (Coastal segments <50 km only):")
     print(f"   Note: This is NOT a validation! Just checking if patterns make sense.\n")
     
+    # One grouped pass over all types (sorted, NaN codes dropped)
+    estuarine = coastal_in_durr['salinity_class_final'].isin(['Oligohaline', 'Mesohaline', 'Polyhaline'])
+    type_stats = estuarine.groupby(coastal_in_durr['FIN_TYP']).agg(['size', 'sum', 'mean'])
+    
     results = []
-    for type_code in sorted(coastal_in_durr['FIN_TYP'].unique()):
-        # Skip NaN values
-        if pd.isna(type_code):
-            continue
-        
+    for type_code, n_segments, estuarine_count, estuarine_frac in type_stats.itertuples():
         # Convert code to integer
         type_code_int = int(type_code)
         
         # Map to name
         type_name = DURR_TYPE_NAMES.get(type_code_int, f'Unknown({type_code_int})')
+        estuarine_pct = estuarine_frac * 100
         
-        type_segments = coastal_in_durr[coastal_in_durr['FIN_TYP'] == type_code]
-        estuarine = type_segments['salinity_class_final'].isin(['Oligohaline', 'Mesohaline', 'Polyhaline'])
-        estuarine_pct = estuarine.mean() * 100
-        
-        print(f"   {type_name:20s}: {estuarine_pct:>5.1f}% estuarine (n={len(type_segments):,})")
+        print(f"   {type_name:20s}: {estuarine_pct:>5.1f}% estuarine (n={n_segments:,})")
         
         results.append({
             'estuary_type_code': type_code_int,
             'estuary_type_name': type_name,
-            'total_segments': len(type_segments),
-            'estuarine_count': estuarine.sum(),
+            'total_segments': n_segments,
+            'estuarine_count': estuarine_count,
             'estuarine_pct': estuarine_pct
         })
     
@@ -701,6 +690,18 @@ def validate_durr_exploratory(region_code: str):
     }
 
 
+def validate_region(region_code: str):
+    """Run all validation methods for one region, returning non-empty results"""
+    results = [
+        validate_globsalt_holdout(region_code),          # Method 1: GlobSalt Holdout (PRIMARY)
+        validate_distance_stratified(region_code),       # Method 2: Distance-Stratified
+        validate_literature_tidal_extent(region_code),   # Method 3: Literature Tidal Extents (GOLD STANDARD #2)
+        validate_discharge_proxy(region_code),           # Method 4: Discharge-Based Proxy
+        validate_durr_exploratory(region_code),          # Method 5: Dürr Exploratory
+    ]
+    return [r for r in results if r]
+
+
 def generate_summary_report(all_results: list):
     """Generate comprehensive validation summary"""
     print_section("📊 COMPREHENSIVE VALIDATION SUMMARY")
@@ -757,34 +758,15 @@ def main():
         return 1
     
     print(f"\n📋 Regions to validate: {', '.join(regions)}")
+    save_literature_database()
     
     all_results = []
     
-    for region_code in regions:
-        # Method 1: GlobSalt Holdout (PRIMARY)
-        result1 = validate_globsalt_holdout(region_code)
-        if result1:
-            all_results.append(result1)
-        
-        # Method 2: Distance-Stratified
-        result2 = validate_distance_stratified(region_code)
-        if result2:
-            all_results.append(result2)
-        
-        # Method 3: Literature Tidal Extents (GOLD STANDARD #2)
-        result3 = validate_literature_tidal_extent(region_code)
-        if result3:
-            all_results.append(result3)
-        
-        # Method 4: Discharge-Based Proxy
-        result4 = validate_discharge_proxy(region_code)
-        if result4:
-            all_results.append(result4)
-        
-        # Method 5: Dürr Exploratory
-        result5 = validate_durr_exploratory(region_code)
-        if result5:
-            all_results.append(result5)
+    # Regions are independent: validate them in parallel, keeping region order
+    max_workers = min(len(regions), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for region_results in executor.map(validate_region, regions):
+            all_results.extend(region_results)
     
     # Generate summary
     generate_summary_report(all_results)
@@ -28,7 +28,6 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import json
-from shapely.geometry import Point
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -67,26 +66,27 @@ def main():
     print("="*80)
     
     # Step 1: Load NetCDF datasets
+    # (time is only averaged over, so skip CF time decoding)
     print("\n📂 STEP 1: Loading DynQual NetCDF files...")
     
     if not DISCHARGE_FILE.exists():
         print(f"   ❌ ERROR: {DISCHARGE_FILE} not found!")
         return
     
-    ds_discharge = xr.open_dataset(DISCHARGE_FILE)
+    ds_discharge = xr.open_dataset(DISCHARGE_FILE, decode_times=False)
     print(f"   ✓ Loaded discharge: {DISCHARGE_FILE.name}")
     print(f"     Shape: {ds_discharge.dims}")
     
     ds_salinity = None
     if SALINITY_FILE.exists():
-        ds_salinity = xr.open_dataset(SALINITY_FILE)
+        ds_salinity = xr.open_dataset(SALINITY_FILE, decode_times=False)
         print(f"   ✓ Loaded salinity: {SALINITY_FILE.name}")
     else:
         print(f"   ⚠️  Salinity file not found (optional)")
     
     ds_temperature = None
     if TEMPERATURE_FILE.exists():
-        ds_temperature = xr.open_dataset(TEMPERATURE_FILE)
+        ds_temperature = xr.open_dataset(TEMPERATURE_FILE, decode_times=False)
         print(f"   ✓ Loaded temperature: {TEMPERATURE_FILE.name}")
     else:
         print(f"   ⚠️  Temperature file not found (optional)")
@@ -102,11 +102,7 @@ def main():
     if 'time' in discharge.dims:
         discharge = discharge.mean(dim='time')
     
-    # Convert to DataFrame
-    df = discharge.to_dataframe().reset_index()
-    df = df.rename(columns={discharge_var: 'discharge'})
-    
-    print(f"   ✓ Extracted {len(df):,} grid cells")
+    grids = {'discharge': discharge}
     
     # Add TDS (Total Dissolved Solids) if available
     if ds_salinity is not None:
@@ -114,20 +110,24 @@ def main():
         tds = ds_salinity[tds_var]
         if 'time' in tds.dims:
             tds = tds.mean(dim='time')
-        df_tds = tds.to_dataframe().reset_index()
-        df = df.merge(df_tds, on=['lat', 'lon'], how='left')
-        df = df.rename(columns={tds_var: 'tds'})
+        grids['tds'] = tds
     
-    # Add temperature if available (convert Kelvin to Celsius!)
+    # Add temperature if available
     if ds_temperature is not None:
         temp_var = list(ds_temperature.data_vars)[0]
         temperature = ds_temperature[temp_var]
         if 'time' in temperature.dims:
             temperature = temperature.mean(dim='time')
-        df_temp = temperature.to_dataframe().reset_index()
-        df = df.merge(df_temp, on=['lat', 'lon'], how='left')
-        df = df.rename(columns={temp_var: 'temperature'})
-        # Convert Kelvin to Celsius
+        grids['temperature'] = temperature
+    
+    # All grids share the same lat/lon axes: align them once in a Dataset and
+    # flatten to one DataFrame instead of hash-merging per-variable frames
+    df = xr.Dataset(grids).to_dataframe(dim_order=list(discharge.dims)).reset_index()
+    
+    print(f"   ✓ Extracted {len(df):,} grid cells")
+    
+    # Convert Kelvin to Celsius!
+    if 'temperature' in df.columns:
         df['temperature'] = df['temperature'] - 273.15
     
     # Step 3: Filter and clean data
@@ -189,7 +189,7 @@ def main():
     # Step 5: Convert to GeoDataFrame
     print("\n🌍 STEP 5: Creating GeoDataFrame...")
     
-    geometry = [Point(lon, lat) for lon, lat in zip(df_global['lon'], df_global['lat'])]
+    geometry = gpd.points_from_xy(df_global['lon'], df_global['lat'])
     gdf = gpd.GeoDataFrame(df_global, geometry=geometry, crs='EPSG:4326')
     
     # Clean up columns
@@ -221,7 +221,8 @@ def main():
     print("\n💾 STEP 6: Exporting to GeoJSON...")
     WEB_DIR.mkdir(parents=True, exist_ok=True)
     
-    gdf.to_file(OUTPUT_FILE, driver='GeoJSON')
+    # 5 decimals (~1 m) is ample for web point markers
+    gdf.to_file(OUTPUT_FILE, driver='GeoJSON', engine='pyogrio', COORDINATE_PRECISION=5)
     
     file_size_mb = OUTPUT_FILE.stat().st_size / 1024**2
     print(f"   ✓ Exported: {OUTPUT_FILE}")
@@ -207,7 +207,8 @@ def main():
     print("\n💾 STEP 7: Exporting to GeoJSON...")
     WEB_DIR.mkdir(parents=True, exist_ok=True)
     
-    gdf.to_file(OUTPUT_FILE, driver='GeoJSON')
+    # 5 decimals (~1 m) is ample for web point markers
+    gdf.to_file(OUTPUT_FILE, driver='GeoJSON', engine='pyogrio', COORDINATE_PRECISION=5)
     
     file_size_mb = OUTPUT_FILE.stat().st_size / 1024**2
     print(f"   ✓ Exported: {OUTPUT_FILE}")